@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming schedule export vs. building the whole document in memory
+Exports a synthetic batch of year-long plans (one per user) to iCalendar and CSV and
+reports throughput and peak traced memory; streaming peak should not grow with the batch.
+
+Usage: python scripts/bench_schedule_export.py [users]
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import tracemalloc
+from typing import Dict, Any, Iterator
+
+import goal_tools
+from schedule_export import ics_chunks, csv_rows, write_ics, write_csv, CSV_COLUMNS
+
+GOALS = [
+    "Learn to play guitar",
+    "Start an online business",
+    "Get fit and lose weight",
+    "Write a novel",
+    "Travel around Japan",
+]
+
+
+def _payloads() -> list:
+    # One serialized year-long plan per goal, decoded per row like ResultsStore.iter_results does
+    payloads = []
+    for goal in GOALS:
+        complexity = goal_tools.analyze_goal_complexity(goal, "12 months")
+        tasks = goal_tools.generate_task_breakdown(goal, "12 months", complexity)
+        payloads.append(json.dumps({
+            "success": True,
+            "tasks": tasks,
+            "timeline": goal_tools.create_execution_timeline(tasks, "12 months")
+        }))
+    return payloads
+
+
+def synthetic_rows(users: int, payloads: list) -> Iterator[Dict[str, Any]]:
+    for i in range(users):
+        yield {
+            "id": i + 1,
+            "user_id": f"user-{i}",
+            "goal": GOALS[i % len(GOALS)],
+            "result": json.loads(payloads[i % len(payloads)])
+        }
+
+
+def buffered_ics(rows, out) -> int:
+    """Baseline: materialize every row and the full document before writing"""
+    document = "".join(ics_chunks(list(rows)))
+    out.write(document)
+    return document.count("BEGIN:VEVENT")
+
+
+def buffered_csv(rows, out) -> int:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    values = list(csv_rows(list(rows)))
+    writer.writerows(values)
+    out.write(buffer.getvalue())
+    return len(values)
+
+
+def _run(fn, users: int, payloads: list) -> int:
+    with open(os.devnull, "w", encoding="utf-8", newline="") as out:
+        return fn(synthetic_rows(users, payloads), out)
+
+
+def measure(label: str, fn, users: int, payloads: list) -> None:
+    # Time without tracemalloc (it slows allocation-heavy code), then trace a second run for peak memory
+    started = time.perf_counter()
+    events = _run(fn, users, payloads)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    _run(fn, users, payloads)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<18}{users:>8}{elapsed:>10.2f}{events / elapsed:>12.0f}{peak / 1024:>12.0f}")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    payloads = _payloads()
+
+    print(f"{'':<18}{'users':>8}{'seconds':>10}{'events/s':>12}{'peak KB':>12}")
+    for batch in (users // 4, users):
+        measure("streaming ics", write_ics, batch, payloads)
+        measure("streaming csv", write_csv, batch, payloads)
+        measure("buffered ics", buffered_ics, batch, payloads)
+        measure("buffered csv", buffered_csv, batch, payloads)
+
+
+if __name__ == "__main__":
+    main()
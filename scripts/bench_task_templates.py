@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark: task template registry vs. rebuilding task dict literals per call
+Measures retained memory and peak allocation with tracemalloc, plus wall time.
+
+Usage: python scripts/bench_task_templates.py [iterations]
+"""
+
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Any
+
+import goal_tools
+from task_templates import get_registry
+
+GOALS = [
+    "Learn to play guitar",
+    "Start an online business",
+    "Get fit and lose weight",
+    "Write a novel",
+    "Travel around Japan",
+]
+
+
+def legacy_generate_task_breakdown(goal: str, timeframe: str, complexity: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Previous implementation: rebuilds every task dict literal on each call"""
+    if not goal or not complexity:
+        raise ValueError("Goal and complexity analysis are required")
+
+    tasks = []
+    goal_lower = goal.lower()
+    difficulty = complexity.get("difficulty_level", "intermediate")
+
+    # Research phase tasks (always included)
+    tasks.append({
+        "title": "Goal analysis and research",
+        "description": f"Deep dive into requirements and best practices for: {goal}",
+        "priority": "high",
+        "estimated_hours": 4,
+        "category": "research",
+        "dependencies": [],
+        "tags": ["research", "planning"]
+    })
+
+    # Learning/Skill-based goals
+    if any(word in goal_lower for word in ["learn", "skill", "study", "master", "course"]):
+        tasks.extend([
+            {
+                "title": "Find learning resources and courses",
+                "description": "Research and select the best learning materials, courses, and mentors",
+                "priority": "high",
+                "estimated_hours": 3,
+                "category": "research",
+                "dependencies": [],
+                "tags": ["learning", "resources"]
+            },
+            {
+                "title": "Create structured learning plan",
+                "description": "Develop a detailed study schedule with milestones and practice sessions",
+                "priority": "high",
+                "estimated_hours": 2,
+                "category": "planning",
+                "dependencies": ["Find learning resources and courses"],
+                "tags": ["planning", "schedule"]
+            },
+            {
+                "title": "Set up practice environment",
+                "description": "Create dedicated space and tools for consistent practice",
+                "priority": "medium",
+                "estimated_hours": 2,
+                "category": "setup",
+                "dependencies": ["Create structured learning plan"],
+                "tags": ["setup", "environment"]
+            },
+            {
+                "title": "Regular practice and application",
+                "description": "Consistent daily/weekly practice sessions with real-world application",
+                "priority": "medium",
+                "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 5,
+                "category": "execution",
+                "dependencies": ["Set up practice environment"],
+                "tags": ["practice", "execution"]
+            }
+        ])
+
+    # Business/Startup goals
+    elif any(word in goal_lower for word in ["business", "startup", "company", "entrepreneur", "launch"]):
+        tasks.extend([
+            {
+                "title": "Market research and validation",
+                "description": "Analyze target market, competition, and validate business idea",
+                "priority": "high",
+                "estimated_hours": 12,
+                "category": "research",
+                "dependencies": [],
+                "tags": ["market", "research", "validation"]
+            },
+            {
+                "title": "Business model development",
+                "description": "Create comprehensive business plan with revenue model and strategy",
+                "priority": "high",
+                "estimated_hours": 16,
+                "category": "planning",
+                "dependencies": ["Market research and validation"],
+                "tags": ["business-plan", "strategy"]
+            },
+            {
+                "title": "MVP development and testing",
+                "description": "Build minimum viable product and gather user feedback",
+                "priority": "high",
+                "estimated_hours": 40,
+                "category": "development",
+                "dependencies": ["Business model development"],
+                "tags": ["mvp", "development", "testing"]
+            },
+            {
+                "title": "Funding and legal setup",
+                "description": "Secure funding, register business, and handle legal requirements",
+                "priority": "medium",
+                "estimated_hours": 8,
+                "category": "legal",
+                "dependencies": ["MVP development and testing"],
+                "tags": ["funding", "legal"]
+            }
+        ])
+
+    # Health/Fitness goals
+    elif any(word in goal_lower for word in ["fitness", "health", "exercise", "diet", "weight", "workout"]):
+        tasks.extend([
+            {
+                "title": "Health assessment and goal setting",
+                "description": "Evaluate current fitness level and set specific, measurable goals",
+                "priority": "high",
+                "estimated_hours": 2,
+                "category": "assessment",
+                "dependencies": [],
+                "tags": ["health", "assessment"]
+            },
+            {
+                "title": "Create personalized fitness plan",
+                "description": "Design workout routine and nutrition plan tailored to goals",
+                "priority": "high",
+                "estimated_hours": 3,
+                "category": "planning",
+                "dependencies": ["Health assessment and goal setting"],
+                "tags": ["fitness", "planning"]
+            },
+            {
+                "title": "Set up tracking and accountability",
+                "description": "Implement progress tracking system and find accountability partner",
+                "priority": "medium",
+                "estimated_hours": 2,
+                "category": "setup",
+                "dependencies": ["Create personalized fitness plan"],
+                "tags": ["tracking", "accountability"]
+            },
+            {
+                "title": "Consistent execution and monitoring",
+                "description": "Follow fitness plan and regularly assess progress",
+                "priority": "medium",
+                "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 3,
+                "category": "execution",
+                "dependencies": ["Set up tracking and accountability"],
+                "tags": ["execution", "monitoring"]
+            }
+        ])
+
+    # Creative goals
+    elif any(word in goal_lower for word in ["create", "build", "design", "write", "paint", "art", "content"]):
+        tasks.extend([
+            {
+                "title": "Creative research and inspiration",
+                "description": "Study similar works, gather inspiration, and understand techniques",
+                "priority": "high",
+                "estimated_hours": 4,
+                "category": "research",
+                "dependencies": [],
+                "tags": ["creative", "research", "inspiration"]
+            },
+            {
+                "title": "Develop creative concept and style",
+                "description": "Define unique approach, style, and creative direction",
+                "priority": "high",
+                "estimated_hours": 6,
+                "category": "planning",
+                "dependencies": ["Creative research and inspiration"],
+                "tags": ["concept", "style", "planning"]
+            },
+            {
+                "title": "Create initial prototypes or drafts",
+                "description": "Develop first versions and iterate based on feedback",
+                "priority": "medium",
+                "estimated_hours": 12,
+                "category": "creation",
+                "dependencies": ["Develop creative concept and style"],
+                "tags": ["prototype", "creation"]
+            },
+            {
+                "title": "Refine and finalize work",
+                "description": "Polish and complete the creative project",
+                "priority": "medium",
+                "estimated_hours": 8,
+                "category": "refinement",
+                "dependencies": ["Create initial prototypes or drafts"],
+                "tags": ["refinement", "finalization"]
+            }
+        ])
+
+    # Generic execution and monitoring tasks
+    tasks.extend([
+        {
+            "title": "Set up progress tracking system",
+            "description": "Create dashboard or system to monitor progress and milestones",
+            "priority": "medium",
+            "estimated_hours": 2,
+            "category": "setup",
+            "dependencies": [],
+            "tags": ["tracking", "setup"]
+        },
+        {
+            "title": "Regular progress reviews and adjustments",
+            "description": "Weekly/monthly assessments and plan modifications as needed",
+            "priority": "medium",
+            "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 1,
+            "category": "monitoring",
+            "dependencies": ["Set up progress tracking system"],
+            "tags": ["review", "adjustment"]
+        }
+    ])
+
+    return tasks
+
+
+def measure(fn, iterations: int) -> Dict[str, float]:
+    complexities = [goal_tools.analyze_goal_complexity(goal, "3 months") for goal in GOALS]
+    results = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(iterations):
+        goal = GOALS[i % len(GOALS)]
+        results.append(fn(goal, "3 months", complexities[i % len(GOALS)]))
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "us_per_call": elapsed / iterations * 1e6,
+        "retained_bytes_per_call": retained / iterations,
+        "peak_kb": peak / 1024
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    get_registry()  # load templates outside the measured region
+
+    legacy = measure(legacy_generate_task_breakdown, iterations)
+    registry = measure(goal_tools.generate_task_breakdown, iterations)
+
+    print(f"{'':<10}{'us/call':>12}{'bytes/call':>14}{'peak KB':>12}")
+    for name, stats in (("legacy", legacy), ("registry", registry)):
+        print(f"{name:<10}{stats['us_per_call']:>12.2f}{stats['retained_bytes_per_call']:>14.0f}{stats['peak_kb']:>12.0f}")
+    saved = 1 - registry["retained_bytes_per_call"] / legacy["retained_bytes_per_call"]
+    print(f"Per-request allocation reduced by {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Asynchronous, batched shipping of Portia plan/run records to Portia cloud
+Records are written to a local durable queue on the request path and shipped in
+batches by a background task, so request latency does not depend on cloud storage
+"""
+
+import os
+import sys
+import time
+import json
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+# (seq, kind, payload) as handed to a sender
+QueuedRecord = Tuple[int, str, str]
+
+
+def default_data_dir() -> str:
+    """Directory for the agent's local state (queues, stores, indexes)"""
+    return os.getenv("DREAM_TASK_DATA_DIR", ".dream-task")
+
+
+class OffloadQueue(ABC):
+    """Interface for the local queue; MemoryOffloadQueue is the stand-in for testing"""
+
+    @abstractmethod
+    def put(self, kind: str, record_id: str, payload: str) -> bool:
+        ...
+
+    @abstractmethod
+    def claim_batch(self, limit: int) -> List[QueuedRecord]:
+        ...
+
+    @abstractmethod
+    def ack(self, seqs: List[int]) -> None:
+        ...
+
+    @abstractmethod
+    def release(self, seqs: List[int], max_attempts: int, retry_after: float = 0.0) -> int:
+        """Return failed records to the queue, claimable again after retry_after seconds;
+        drops (and counts) those out of attempts"""
+
+    @abstractmethod
+    def unclaim(self, seqs: List[int]) -> None:
+        """Return claimed records untouched (shipping was interrupted, not failed)"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryOffloadQueue(OffloadQueue):
+    """In-memory queue with the same bounds and semantics as the SQLite queue"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._records: "deque[List[Any]]" = deque()  # [seq, kind, record_id, payload, attempts, claimed, not_before]
+        self._next_seq = 1
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, kind: str, record_id: str, payload: str) -> bool:
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            self.dropped += 1
+            return False
+        with self._lock:
+            while self._records and self._bytes + size > self.max_bytes:
+                oldest = self._records.popleft()
+                self._bytes -= len(oldest[3].encode("utf-8"))
+                self.dropped += 1
+            self._records.append([self._next_seq, kind, record_id, payload, 0, False, 0.0])
+            self._next_seq += 1
+            self._bytes += size
+        return True
+
+    def claim_batch(self, limit: int) -> List[QueuedRecord]:
+        batch = []
+        now = time.time()
+        with self._lock:
+            for record in self._records:
+                if len(batch) >= limit:
+                    break
+                if not record[5] and record[6] <= now:
+                    record[5] = True
+                    batch.append((record[0], record[1], record[3]))
+        return batch
+
+    def ack(self, seqs: List[int]) -> None:
+        done = set(seqs)
+        with self._lock:
+            kept = deque()
+            for record in self._records:
+                if record[0] in done:
+                    self._bytes -= len(record[3].encode("utf-8"))
+                else:
+                    kept.append(record)
+            self._records = kept
+
+    def release(self, seqs: List[int], max_attempts: int, retry_after: float = 0.0) -> int:
+        failed = set(seqs)
+        dropped = []
+        not_before = time.time() + retry_after
+        with self._lock:
+            for record in self._records:
+                if record[0] in failed:
+                    record[4] += 1
+                    record[5] = False
+                    record[6] = not_before
+                    if record[4] >= max_attempts:
+                        dropped.append(record[0])
+        if dropped:
+            self.ack(dropped)
+            self.dropped += len(dropped)
+        return len(dropped)
+
+    def unclaim(self, seqs: List[int]) -> None:
+        claimed = set(seqs)
+        with self._lock:
+            for record in self._records:
+                if record[0] in claimed:
+                    record[5] = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._records), "bytes": self._bytes, "max_bytes": self.max_bytes, "dropped": self.dropped}
+
+
+class SQLiteOffloadQueue(OffloadQueue):
+    """Durable queue in a local SQLite file, bounded by total payload bytes
+
+    Claimed rows are leased rather than deleted, so a crashed process's batch is
+    picked up again by the next shipper once the lease expires.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, lease_seconds: float = 60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.dropped = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS offload_records (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                record_id TEXT,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                leased_until REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def put(self, kind: str, record_id: str, payload: str) -> bool:
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            self.dropped += 1
+            return False
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM offload_records").fetchone()[0]
+                # Bounded disk usage: drop the oldest records to make room
+                while total + size > self.max_bytes:
+                    row = self._conn.execute("SELECT seq, size FROM offload_records ORDER BY seq LIMIT 1").fetchone()
+                    if row is None:
+                        break
+                    self._conn.execute("DELETE FROM offload_records WHERE seq = ?", (row[0],))
+                    total -= row[1]
+                    self.dropped += 1
+                self._conn.execute(
+                    "INSERT INTO offload_records (kind, record_id, payload, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (kind, record_id, payload, size, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def claim_batch(self, limit: int) -> List[QueuedRecord]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT seq, kind, payload FROM offload_records WHERE leased_until < ? ORDER BY seq LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE offload_records SET leased_until = ? WHERE seq = ?",
+                        [(now + self.lease_seconds, row[0]) for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    def ack(self, seqs: List[int]) -> None:
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM offload_records WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def release(self, seqs: List[int], max_attempts: int, retry_after: float = 0.0) -> int:
+        if not seqs:
+            return 0
+        # The lease doubles as the not-before time of the next attempt
+        not_before = time.time() + retry_after
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE offload_records SET attempts = attempts + 1, leased_until = ? WHERE seq = ?",
+                    [(not_before, seq) for seq in seqs]
+                )
+                dropped = self._conn.execute(
+                    "DELETE FROM offload_records WHERE attempts >= ?", (max_attempts,)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.dropped += dropped
+        return dropped
+
+    def unclaim(self, seqs: List[int]) -> None:
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("UPDATE offload_records SET leased_until = 0 WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM offload_records"
+            ).fetchone()
+        return {"pending": pending, "bytes": total, "max_bytes": self.max_bytes, "dropped": self.dropped}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PortiaCloudSender:
+    """Ships queued plan/run records with Portia's cloud storage client"""
+
+    def __init__(self, config: Any):
+        from portia import Plan, PlanRun
+        from portia.storage import PortiaCloudStorage
+        self._plan_cls = Plan
+        self._plan_run_cls = PlanRun
+        self._storage = PortiaCloudStorage(config=config)
+
+    def __call__(self, records: List[QueuedRecord]) -> None:
+        for _seq, kind, payload in records:
+            if kind == "plan":
+                self._storage.save_plan(self._plan_cls.model_validate_json(payload))
+            elif kind == "plan_run":
+                self._storage.save_plan_run(self._plan_run_cls.model_validate_json(payload))
+            else:
+                print(f"[DEBUG] Skipping unknown offload record kind: {kind}", file=sys.stderr)
+
+
+class CloudShipper:
+    """Background task that drains an OffloadQueue to the cloud in batches with retry"""
+
+    def __init__(self, queue: OffloadQueue, sender: Callable[[List[QueuedRecord]], None],
+                 batch_size: int = 50, poll_interval: float = 1.0,
+                 max_attempts: int = 8, max_backoff: float = 60.0):
+        self.queue = queue
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._failures = 0
+        self.shipped = 0
+        self.failed_batches = 0
+
+    def enqueue(self, kind: str, record_id: str, payload: str) -> bool:
+        """Write a record to the local queue (the only work done on the request path)"""
+        accepted = self.queue.put(kind, record_id, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return accepted
+
+    def ensure_started(self) -> None:
+        """Start the background loop on the running event loop if it is not running yet"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            shipped = await self.ship_once()
+            if shipped:
+                continue
+            if self._failures:
+                # Backing off: new records must not trigger an early retry against a failing cloud
+                await asyncio.sleep(self._backoff_delay())
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _backoff_delay(self) -> float:
+        return min(self.max_backoff, self.poll_interval * (2 ** self._failures))
+
+    async def ship_once(self) -> int:
+        """Ship a single batch; returns the number of records delivered"""
+        batch = self.queue.claim_batch(self.batch_size)
+        if not batch:
+            return 0
+        seqs = [seq for seq, _kind, _payload in batch]
+        try:
+            await asyncio.to_thread(self.sender, batch)
+        except asyncio.CancelledError:
+            # Stopped mid-batch: leave the records for the next shipper instead of a 60 s lease
+            self.queue.unclaim(seqs)
+            raise
+        except Exception as e:
+            self._failures += 1
+            self.failed_batches += 1
+            dropped = self.queue.release(seqs, self.max_attempts, retry_after=self._backoff_delay())
+            print(f"[DEBUG] Cloud offload batch failed ({len(batch)} records, {dropped} dropped): {e}", file=sys.stderr)
+            return 0
+        self._failures = 0
+        self.queue.ack(seqs)
+        self.shipped += len(batch)
+        return len(batch)
+
+    async def stop(self, flush_timeout: float = 0.0) -> None:
+        """Stop the loop, optionally draining for up to flush_timeout seconds
+
+        Anything left stays in the durable queue for the next process to ship.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        deadline = time.monotonic() + flush_timeout
+        while time.monotonic() < deadline:
+            try:
+                shipped = await asyncio.wait_for(self.ship_once(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            if not shipped:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.queue.stats()
+        stats.update({"shipped": self.shipped, "failed_batches": self.failed_batches})
+        return stats
+
+
+def open_queue(path: Optional[str] = None) -> OffloadQueue:
+    """Open the configured durable queue (PORTIA_OFFLOAD_QUEUE=memory gives the in-memory stand-in)"""
+    max_bytes = int(os.getenv("PORTIA_OFFLOAD_MAX_BYTES", str(64 * 1024 * 1024)))
+    if os.getenv("PORTIA_OFFLOAD_QUEUE", "sqlite").lower() == "memory":
+        return MemoryOffloadQueue(max_bytes=max_bytes)
+    return SQLiteOffloadQueue(path or os.path.join(default_data_dir(), "cloud_offload.db"), max_bytes=max_bytes)
+
+
+async def drain(timeout: float) -> Dict[str, Any]:
+    """Ship everything queued locally (for cron jobs or after an outage)"""
+    from portia import Config
+    shipper = CloudShipper(open_queue(), PortiaCloudSender(Config.from_default()))
+    await shipper.stop(flush_timeout=timeout)
+    return shipper.stats()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("drain", "stats"):
+        print("Usage: python cloud_offload.py drain [timeout_seconds] | stats")
+        sys.exit(1)
+    if sys.argv[1] == "stats":
+        print(json.dumps(open_queue().stats(), indent=2))
+    else:
+        print(json.dumps(asyncio.run(drain(float(sys.argv[2]) if len(sys.argv) > 2 else 300.0)), indent=2))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Adaptive goal routing
+Scores a goal from the cheap analyze_goal_complexity signals and picks the rule-based
+engine, a faster/cheaper model, or the full Portia plan
+"""
+
+import sys
+from typing import Dict, Any, Optional
+
+import goal_tools
+from task_templates import get_registry
+
+ROUTE_LOCAL = "local"
+ROUTE_FAST = "fast"
+ROUTE_FULL = "full"
+
+_DIFFICULTY_SCORES = {"beginner": 0.0, "intermediate": 0.15, "advanced": 0.3}
+
+
+def score_goal(goal: str, timeframe: str) -> Dict[str, Any]:
+    """Return {"score", "signals"}; the score (0-1) rises with how much an LLM adds over the templates"""
+    complexity = goal_tools.analyze_goal_complexity(goal, timeframe)
+    categories = get_registry().match(goal, match_all=True)
+    signals = {
+        "word_count": len(goal.split()),
+        "difficulty": complexity["difficulty_level"],
+        "template_categories": categories,
+        "risk_factors": len(complexity["risk_factors"]),
+        "requirements": len(complexity["skill_requirements"]) + len(complexity["resource_needs"]),
+        "duration_weeks": complexity["estimated_duration_weeks"]
+    }
+
+    score = min(signals["word_count"], 30) / 30 * 0.3
+    score += _DIFFICULTY_SCORES.get(signals["difficulty"], 0.15)
+    # No matching templates means the local engine only has generic tasks to offer;
+    # several matches means a cross-domain goal the templates can't sequence
+    if not categories:
+        score += 0.25
+    else:
+        score += 0.1 * (len(categories) - 1)
+    score += 0.05 * signals["risk_factors"]
+    score += 0.03 * signals["requirements"]
+    if signals["duration_weeks"] >= 26:
+        score += 0.1
+    return {"score": round(min(score, 1.0), 3), "signals": signals}
+
+
+class GoalRouter:
+    """Chooses a planning route per goal; in shadow mode it only records its decisions"""
+
+    def __init__(self, local_below: float = 0.35, full_above: float = 0.55,
+                 fast_model: Optional[str] = None, shadow: bool = False):
+        self.local_below = local_below
+        self.full_above = full_above
+        self.fast_model = fast_model or None
+        self.shadow = shadow
+        self.routes = {ROUTE_LOCAL: 0, ROUTE_FAST: 0, ROUTE_FULL: 0}
+        self.total_score = 0.0
+        self.decisions = 0
+
+    def route(self, goal: str, timeframe: str) -> Dict[str, Any]:
+        """Return {"route", "score", "signals", "model", "shadow"}"""
+        scored = score_goal(goal, timeframe)
+        score = scored["score"]
+        if score < self.local_below:
+            route = ROUTE_LOCAL
+        elif score < self.full_above and self.fast_model:
+            route = ROUTE_FAST
+        else:
+            route = ROUTE_FULL
+
+        self.routes[route] += 1
+        self.total_score += score
+        self.decisions += 1
+        verb = "would route" if self.shadow else "routing"
+        print(f"[DEBUG] Router {verb} goal to '{route}' (score {score:.2f})", file=sys.stderr)
+        return {
+            "route": route,
+            "score": score,
+            "signals": scored["signals"],
+            "model": self.fast_model if route == ROUTE_FAST else None,
+            "shadow": self.shadow
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "shadow" if self.shadow else "on",
+            "local_below": self.local_below,
+            "full_above": self.full_above,
+            "fast_model": self.fast_model,
+            "routes": dict(self.routes),
+            "avg_score": round(self.total_score / self.decisions, 3) if self.decisions else 0.0
+        }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Deterministic goal-processing tools
+Plain functions behind the Portia tools registered by the agent, also usable directly
+(e.g. to adapt a reused plan) without an LLM
+"""
+
+from typing import Dict, List, Any
+from datetime import datetime, timedelta
+
+from task_templates import get_registry, keyword_pattern
+
+
+# Checked in order, first match wins; matched with the task templates' keyword rule
+_GOAL_CATEGORIES = tuple((name, keyword_pattern(keywords)) for name, keywords in (
+    ("learning", ["learn", "skill", "study", "master", "course"]),
+    ("business", ["business", "startup", "company", "entrepreneur"]),
+    ("health", ["fitness", "health", "exercise", "diet", "weight"]),
+    ("creative", ["create", "build", "design", "write", "paint", "art"]),
+    ("travel", ["travel", "visit", "explore"]),
+    ("financial", ["save", "invest", "money", "financial"]),
+))
+
+
+def categorize_goal(goal: str) -> str:
+    """Categorize the goal type for better analysis"""
+    goal_lower = goal.lower()
+    for name, pattern in _GOAL_CATEGORIES:
+        if pattern.search(goal_lower):
+            return name
+    return "general"
+
+
+def analyze_goal_complexity(goal: str, timeframe: str) -> Dict[str, Any]:
+    """Analyze goal complexity and provide insights with enhanced validation"""
+    if not goal or not timeframe:
+        raise ValueError("Goal and timeframe are required")
+
+    complexity_factors = {
+        "skill_requirements": [],
+        "time_investment": "medium",
+        "resource_needs": [],
+        "difficulty_level": "intermediate",
+        "success_probability": 0.7,
+        "estimated_duration_weeks": 4,
+        "risk_factors": []
+    }
+
+    # Enhanced complexity analysis
+    goal_lower = goal.lower()
+    word_count = len(goal.split())
+
+    # Complexity based on goal length and content
+    if word_count > 30:
+        complexity_factors["difficulty_level"] = "advanced"
+        complexity_factors["success_probability"] = 0.5
+        complexity_factors["risk_factors"].append("overly complex goal")
+    elif word_count > 15:
+        complexity_factors["difficulty_level"] = "intermediate"
+        complexity_factors["success_probability"] = 0.7
+
+    # Skill-based goals
+    if any(word in goal_lower for word in ["learn", "master", "become expert", "study"]):
+        complexity_factors["skill_requirements"].extend(["continuous learning", "practice time"])
+        complexity_factors["time_investment"] = "high"
+        complexity_factors["estimated_duration_weeks"] = 12
+        complexity_factors["risk_factors"].append("learning curve")
+
+    # Business/startup goals
+    if any(word in goal_lower for word in ["business", "startup", "company", "entrepreneur"]):
+        complexity_factors["resource_needs"].extend(["funding", "team", "market research", "legal setup"])
+        complexity_factors["difficulty_level"] = "advanced"
+        complexity_factors["success_probability"] = 0.4
+        complexity_factors["estimated_duration_weeks"] = 26
+        complexity_factors["risk_factors"].extend(["market competition", "funding challenges"])
+
+    # Health/fitness goals
+    if any(word in goal_lower for word in ["fitness", "health", "exercise", "diet", "weight"]):
+        complexity_factors["skill_requirements"].append("habit formation")
+        complexity_factors["resource_needs"].extend(["gym access", "nutrition plan"])
+        complexity_factors["estimated_duration_weeks"] = 8
+        complexity_factors["risk_factors"].append("motivation maintenance")
+
+    # Creative goals
+    if any(word in goal_lower for word in ["create", "build", "design", "write", "paint"]):
+        complexity_factors["skill_requirements"].append("creative skills")
+        complexity_factors["resource_needs"].append("creative tools")
+        complexity_factors["estimated_duration_weeks"] = 6
+
+    return complexity_factors
+
+
+def generate_task_breakdown(goal: str, timeframe: str, complexity: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Generate detailed task breakdown with enhanced categorization"""
+    if not goal or not complexity:
+        raise ValueError("Goal and complexity analysis are required")
+
+    # Tasks for the first matching category, from the shared template registry
+    return get_registry().build_tasks(goal, complexity.get("estimated_duration_weeks", 4))
+
+
+def create_execution_timeline(tasks: List[Dict[str, Any]], timeframe: str) -> Dict[str, Any]:
+    """Create execution timeline with scheduling"""
+
+    # Parse timeframe
+    timeframe_days = 30  # default
+    if "week" in timeframe.lower():
+        timeframe_days = int(timeframe.split()[0]) * 7 if timeframe.split()[0].isdigit() else 7
+    elif "month" in timeframe.lower():
+        timeframe_days = int(timeframe.split()[0]) * 30 if timeframe.split()[0].isdigit() else 30
+    elif "year" in timeframe.lower():
+        timeframe_days = int(timeframe.split()[0]) * 365 if timeframe.split()[0].isdigit() else 365
+
+    # Calculate timeline
+    total_hours = sum(task.get("estimated_hours", 1) for task in tasks)
+    hours_per_week = min(20, total_hours / (timeframe_days / 7))  # Max 20 hours per week
+
+    timeline = {
+        "total_duration_days": timeframe_days,
+        "total_estimated_hours": total_hours,
+        "hours_per_week": hours_per_week,
+        "weekly_schedule": [],
+        "milestones": []
+    }
+
+    # Create weekly breakdown
+    current_date = datetime.now()
+    for week in range(int(timeframe_days / 7)):
+        week_start = current_date + timedelta(weeks=week)
+        week_tasks = tasks[week:week+2] if week < len(tasks) else []
+
+        timeline["weekly_schedule"].append({
+            "week": week + 1,
+            "start_date": week_start.isoformat(),
+            "tasks": [task["title"] for task in week_tasks],
+            "focus_area": week_tasks[0]["category"] if week_tasks else "review"
+        })
+
+    # Add milestones
+    milestone_intervals = max(1, int(timeframe_days / 30))  # Monthly milestones
+    for i in range(0, timeframe_days, milestone_intervals):
+        milestone_date = current_date + timedelta(days=i)
+        timeline["milestones"].append({
+            "date": milestone_date.isoformat(),
+            "title": f"Milestone {i//milestone_intervals + 1}",
+            "description": "Review progress and adjust plan"
+        })
+
+    return timeline
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Micro-batching of small generative LLM subtasks
+Requests arriving within a few milliseconds of each other are collected into one
+structured multi-item LLM call and the results fanned back out to each caller.
+Used for per-goal success tips and obstacle mitigations (Gemini via google.generativeai).
+"""
+
+import sys
+import json
+import time
+import asyncio
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+
+GENAI_AVAILABLE = False
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    print("[DEBUG] google-generativeai not available, generated guidance disabled", file=sys.stderr)
+
+from prompt_builder import estimate_tokens
+from rate_limiter import Priority, QuotaRateLimiter
+
+
+class MicroBatcher:
+    """Collects submitted items for up to max_wait seconds (or max_batch_size items) per batch call
+
+    batch_fn receives the list of items and returns a list of results in the same order.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 16, max_wait: float = 0.01):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._items: List[Any] = []
+        self._futures: List["asyncio.Future"] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batch task -> the futures of its callers
+        self._tasks: Dict["asyncio.Task", List["asyncio.Future"]] = {}
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result (raises if its batch call failed)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            self._abandon(future)
+            raise
+
+    def _abandon(self, future: "asyncio.Future") -> None:
+        """Drop a cancelled caller's item, or stop its batch call once every caller has gone"""
+        for i, pending in enumerate(self._futures):
+            if pending is future:
+                del self._items[i], self._futures[i]
+                if not self._items and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                return
+        for task, futures in self._tasks.items():
+            if any(f is future for f in futures):
+                if all(f.done() for f in futures):
+                    task.cancel()
+                return
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        task = asyncio.get_running_loop().create_task(self._run_batch(items, futures))
+        self._tasks[task] = futures
+        task.add_done_callback(lambda t: self._tasks.pop(t, None))
+
+    async def _run_batch(self, items: List[Any], futures: List["asyncio.Future"]) -> None:
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await self.batch_fn(items)
+            if len(results) != len(items):
+                raise ValueError(f"Batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            self.failed_batches += 1
+            print(f"[DEBUG] Micro-batch of {len(items)} failed: {e}", file=sys.stderr)
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+                    # Callers that timed out never retrieve it
+                    future.exception()
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "failed_batches": self.failed_batches,
+            "pending": len(self._items)
+        }
+
+
+GUIDANCE_INSTRUCTIONS = (
+    "For each goal below write 5 specific success tips and 3 likely obstacles, each with a mitigation. "
+    "Reply with only a JSON array holding one object per goal: "
+    '{"id": <goal id>, "success_tips": [string], "obstacles": [{"obstacle": string, "mitigation": string}]}'
+)
+
+# Rough completion size per goal, for the rate limiter's token accounting
+GUIDANCE_TOKENS_PER_ITEM = 250
+
+
+def _valid_guidance(entry: Any) -> Optional[Dict[str, Any]]:
+    """{"success_tips", "potential_obstacles"} from one response object, or None if malformed"""
+    if not isinstance(entry, dict):
+        return None
+    tips = [t.strip() for t in entry.get("success_tips") or [] if isinstance(t, str) and t.strip()]
+    obstacles = [
+        {"obstacle": o["obstacle"].strip(), "mitigation": o["mitigation"].strip()}
+        for o in entry.get("obstacles") or []
+        if isinstance(o, dict) and isinstance(o.get("obstacle"), str) and isinstance(o.get("mitigation"), str)
+    ]
+    if not tips or not obstacles:
+        return None
+    return {"success_tips": tips, "potential_obstacles": obstacles}
+
+
+class GeminiGuidance:
+    """Batch function: one Gemini request for the success tips and obstacles of many goals"""
+
+    def __init__(self, model: str, api_key: str, rate_limiter: Optional[QuotaRateLimiter] = None,
+                 timeout: float = 15.0):
+        if not GENAI_AVAILABLE:
+            raise RuntimeError("google-generativeai is required for generated guidance")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+        self.model_name = model
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+
+    def build_prompt(self, items: List[Dict[str, Any]]) -> str:
+        goals = [{"id": i, "goal": item["goal"], "timeframe": item["timeframe"]} for i, item in enumerate(items)]
+        return f"{GUIDANCE_INSTRUCTIONS}\nGoals: {json.dumps(goals, separators=(',', ':'))}"
+
+    def parse_response(self, text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+        """Results by goal id; goals missing or malformed in the reply get None"""
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("goals") or data.get("results") or [data]
+        results: List[Optional[Dict[str, Any]]] = [None] * count
+        for entry in data:
+            goal_id = entry.get("id") if isinstance(entry, dict) else None
+            if isinstance(goal_id, int) and 0 <= goal_id < count:
+                results[goal_id] = _valid_guidance(entry)
+        return results
+
+    async def __call__(self, items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        prompt = self.build_prompt(items)
+        request = lambda: self.model.generate_content_async(
+            prompt, generation_config={"response_mime_type": "application/json"}
+        )
+        if self.rate_limiter is not None:
+            # The batch waits at the priority of its most urgent item, and no longer than
+            # its callers do: past the timeout they have already fallen back to built-in tips
+            response = await self.rate_limiter.call(
+                request,
+                tokens=estimate_tokens(prompt) + GUIDANCE_TOKENS_PER_ITEM * len(items),
+                priority=min(Priority.parse(item.get("priority", Priority.INTERACTIVE)) for item in items),
+                deadline=time.monotonic() + self.timeout
+            )
+        else:
+            response = await request()
+        return self.parse_response(response.text, len(items))
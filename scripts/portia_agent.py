@@ -7,6 +7,8 @@ Enhanced version with better Portia SDK integration, cloud logging, and producti
 import os
 import sys
 import json
+import copy
+import time
 import asyncio
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
@@ -15,17 +17,36 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv(override=True)
 
+import goal_tools
+from session_cache import SessionCache, UserSession
+from cloud_offload import CloudShipper, PortiaCloudSender, default_data_dir, open_queue
+from results_store import ResultsStore, open_results_store, normalize_timeframe
+from similarity_index import GoalSimilarityIndex, open_goal_index, numeric_tokens
+from prompt_builder import PromptBuilder
+from task_templates import get_registry
+from single_flight import SingleFlight, flight_key
+from rate_limiter import Priority, QuotaRateLimiter, QueueDropped, RateLimitExceeded
+from goal_router import GoalRouter, ROUTE_LOCAL
+from pre_planner import SpeculativePlanner, CANONICAL_TIMEFRAMES
+from micro_batcher import MicroBatcher, GeminiGuidance, GENAI_AVAILABLE
+
 PORTIA_AVAILABLE = False
+ENDUSER_AVAILABLE = False
 try:
     from portia import Config, Portia, DefaultToolRegistry, Tool, Plan, PlanBuilder
     from portia.cli import CLIExecutionHooks
     from portia.tool_registry import ToolRegistry
     from portia import PlanRunState, Clarification, StorageClass, LogLevel
-    from portia.end_user import EndUser
     config = Config.from_default(llm_provider="google")
-    
+
     PORTIA_AVAILABLE = True
-    
+
+    try:
+        from portia.end_user import EndUser
+        ENDUSER_AVAILABLE = True
+    except ImportError:
+        EndUser = None
+
     # Check Portia version for compatibility
     try:
         import portia
@@ -33,19 +54,43 @@ try:
         print(f"[DEBUG] Portia SDK loaded successfully (version: {portia_version})", file=sys.stderr)
     except Exception:
         print("[DEBUG] Portia SDK loaded successfully (version unknown)", file=sys.stderr)
-        
+
 except ImportError as e:
     print(f"[DEBUG] Portia SDK not available: {e}", file=sys.stderr)
     print("[DEBUG] Running in fallback mode", file=sys.stderr)
-    ENDUSER_AVAILABLE = False
+    EndUser = None
 
-class DreamTaskAgent:
-    """Main agent class for processing dreams into actionable tasks"""
-    
-    def __init__(self, user_id: Optional[str] = None, enable_cloud_logging: bool = True):
-        self.user_id = user_id or "default-user"
+class AgentRuntime:
+    """Expensive shared state (config, tool registry, Portia instance) reused by all users"""
+
+    def __init__(self, enable_cloud_logging: bool = True):
         self.enable_cloud_logging = enable_cloud_logging
-        
+        self.config = None
+        self.tool_registry = None
+        self.portia = None
+        self._model_portias: Dict[str, Any] = {}
+        self.cloud_shipper: Optional[CloudShipper] = None
+        # One quota for every LLM call in the process, whichever user or job makes it
+        self.rate_limiter = QuotaRateLimiter(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "1000")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3"))
+        )
+        # Success tips and obstacles for concurrent requests share one batched Gemini call
+        self.guidance_batcher: Optional[MicroBatcher] = None
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if GENAI_AVAILABLE and gemini_api_key and os.getenv("GUIDANCE_BATCHING", "on").lower() not in ("off", "false", "0"):
+            try:
+                self.guidance_batcher = MicroBatcher(
+                    GeminiGuidance(os.getenv("GUIDANCE_MODEL", "gemini-2.5-flash-lite"), gemini_api_key, self.rate_limiter,
+                                   timeout=float(os.getenv("GUIDANCE_TIMEOUT_SECONDS", "15"))),
+                    max_batch_size=int(os.getenv("GUIDANCE_MAX_BATCH_SIZE", "16")),
+                    max_wait=float(os.getenv("GUIDANCE_MAX_WAIT_MS", "10")) / 1000
+                )
+            except Exception as e:
+                print(f"[DEBUG] Failed to set up generated guidance: {e}", file=sys.stderr)
+
         if PORTIA_AVAILABLE:
             try:
                 # Load config safely (without requiring env vars upfront)
@@ -60,8 +105,20 @@ class DreamTaskAgent:
                 # Enable cloud logging if API key is present
                 if enable_cloud_logging and os.getenv("PORTIA_API_KEY","prt-Efed6dNJ.qfVo5kEnKq7rQ8JeXx8SSE11MsePlYX4"):
                     try:
-                        self.config.storage_class = StorageClass.CLOUD
-                        print("[DEBUG] Cloud logging enabled", file=sys.stderr)
+                        # serve() defaults to async; one-shot CLI processes store synchronously,
+                        # since nothing would be left running to ship their records
+                        if os.getenv("PORTIA_CLOUD_LOGGING_MODE", "sync").lower() == "async":
+                            # Keep storage local on the request path and ship records in the background
+                            self.config.storage_class = StorageClass.MEMORY
+                            self.cloud_shipper = CloudShipper(
+                                open_queue(),
+                                PortiaCloudSender(self.config),
+                                batch_size=int(os.getenv("PORTIA_OFFLOAD_BATCH_SIZE", "50"))
+                            )
+                            print("[DEBUG] Cloud logging enabled (async offload)", file=sys.stderr)
+                        else:
+                            self.config.storage_class = StorageClass.CLOUD
+                            print("[DEBUG] Cloud logging enabled", file=sys.stderr)
                     except Exception as e:
                         print(f"[DEBUG] Failed to enable cloud logging: {e}", file=sys.stderr)
 
@@ -93,13 +150,63 @@ class DreamTaskAgent:
 
                 # Add custom tools
                 self._register_custom_tools()
-                print("[DEBUG] Portia agent initialized successfully", file=sys.stderr)
+                print("[DEBUG] Portia runtime initialized successfully", file=sys.stderr)
 
             except Exception as e:
                 print(f"[DEBUG] Failed to initialize Portia: {e}", file=sys.stderr)
                 self.portia = None
-        else:
-            self.portia = None
+
+    def portia_for_model(self, model: Optional[str]) -> Any:
+        """Portia instance planning with `model`, sharing tools and hooks with the default one"""
+        if not model or self.portia is None or model == str(self.config.default_model):
+            return self.portia
+        portia = self._model_portias.get(model)
+        if portia is None:
+            try:
+                portia = Portia(
+                    config=self.config.model_copy(update={"default_model": model}),
+                    tools=self.tool_registry,
+                    execution_hooks=self.execution_hooks,
+                )
+                print(f"[DEBUG] Portia instance created for model: {model}", file=sys.stderr)
+            except Exception as e:
+                print(f"[DEBUG] Failed to create Portia for model {model}, using default: {e}", file=sys.stderr)
+                portia = self.portia
+            self._model_portias[model] = portia
+        return portia
+    
+    def start_background(self) -> None:
+        """Start background work (cloud offload shipping) on the running event loop"""
+        if self.cloud_shipper is not None:
+            self.cloud_shipper.ensure_started()
+    
+    def offload_run(self, plan: Any, plan_run: Any, portia: Any = None) -> None:
+        """Queue plan and run records for asynchronous cloud storage, then drop Portia's in-memory copies"""
+        if self.cloud_shipper is not None:
+            try:
+                self.cloud_shipper.enqueue("plan", str(getattr(plan, "id", "")), plan.model_dump_json())
+                self.cloud_shipper.enqueue("plan_run", str(getattr(plan_run, "id", "")), plan_run.model_dump_json())
+            except Exception as e:
+                print(f"[DEBUG] Failed to queue records for cloud logging: {e}", file=sys.stderr)
+        self.release_run(portia or self.portia, plan, plan_run)
+    
+    def release_run(self, portia: Any, plan: Any, plan_run: Any) -> None:
+        """Evict a finished plan and run from Portia's in-memory storage, which otherwise keeps them for the process lifetime"""
+        storage = getattr(portia, "storage", None)
+        plan_id = getattr(plan, "id", None)
+        run_id = getattr(plan_run, "id", None)
+        for attr, key in (("plans", plan_id), ("runs", run_id), ("outputs", run_id)):
+            records = getattr(storage, attr, None)
+            # Only the in-memory storage keeps plain dicts; cloud/disk storage is left alone
+            if key is None or not isinstance(records, dict):
+                continue
+            records.pop(key, None)
+            records.pop(str(key), None)
+    
+    async def shutdown(self) -> None:
+        """Stop background work; unshipped records stay in the local queue for the next process"""
+        if self.cloud_shipper is not None:
+            await self.cloud_shipper.stop(flush_timeout=float(os.getenv("PORTIA_OFFLOAD_FLUSH_TIMEOUT", "0")))
     
     def _register_custom_tools(self):
         """Register custom tools for dream-to-task processing"""
@@ -112,61 +219,7 @@ class DreamTaskAgent:
         )
         def analyze_goal_complexity(goal: str, timeframe: str) -> Dict[str, Any]:
             """Analyze goal complexity and provide insights with enhanced validation"""
-            if not goal or not timeframe:
-                raise ValueError("Goal and timeframe are required")
-            
-            complexity_factors = {
-                "skill_requirements": [],
-                "time_investment": "medium",
-                "resource_needs": [],
-                "difficulty_level": "intermediate",
-                "success_probability": 0.7,
-                "estimated_duration_weeks": 4,
-                "risk_factors": []
-            }
-            
-            # Enhanced complexity analysis
-            goal_lower = goal.lower()
-            word_count = len(goal.split())
-            
-            # Complexity based on goal length and content
-            if word_count > 30:
-                complexity_factors["difficulty_level"] = "advanced"
-                complexity_factors["success_probability"] = 0.5
-                complexity_factors["risk_factors"].append("overly complex goal")
-            elif word_count > 15:
-                complexity_factors["difficulty_level"] = "intermediate"
-                complexity_factors["success_probability"] = 0.7
-            
-            # Skill-based goals
-            if any(word in goal_lower for word in ["learn", "master", "become expert", "study"]):
-                complexity_factors["skill_requirements"].extend(["continuous learning", "practice time"])
-                complexity_factors["time_investment"] = "high"
-                complexity_factors["estimated_duration_weeks"] = 12
-                complexity_factors["risk_factors"].append("learning curve")
-            
-            # Business/startup goals
-            if any(word in goal_lower for word in ["business", "startup", "company", "entrepreneur"]):
-                complexity_factors["resource_needs"].extend(["funding", "team", "market research", "legal setup"])
-                complexity_factors["difficulty_level"] = "advanced"
-                complexity_factors["success_probability"] = 0.4
-                complexity_factors["estimated_duration_weeks"] = 26
-                complexity_factors["risk_factors"].extend(["market competition", "funding challenges"])
-            
-            # Health/fitness goals
-            if any(word in goal_lower for word in ["fitness", "health", "exercise", "diet", "weight"]):
-                complexity_factors["skill_requirements"].append("habit formation")
-                complexity_factors["resource_needs"].extend(["gym access", "nutrition plan"])
-                complexity_factors["estimated_duration_weeks"] = 8
-                complexity_factors["risk_factors"].append("motivation maintenance")
-            
-            # Creative goals
-            if any(word in goal_lower for word in ["create", "build", "design", "write", "paint"]):
-                complexity_factors["skill_requirements"].append("creative skills")
-                complexity_factors["resource_needs"].append("creative tools")
-                complexity_factors["estimated_duration_weeks"] = 6
-            
-            return complexity_factors
+            return goal_tools.analyze_goal_complexity(goal, timeframe)
         
         @Tool(
             name="generate_task_breakdown",
@@ -174,211 +227,7 @@ class DreamTaskAgent:
         )
         def generate_task_breakdown(goal: str, timeframe: str, complexity: Dict[str, Any]) -> List[Dict[str, Any]]:
             """Generate detailed task breakdown with enhanced categorization"""
-            if not goal or not complexity:
-                raise ValueError("Goal and complexity analysis are required")
-            
-            tasks = []
-            goal_lower = goal.lower()
-            difficulty = complexity.get("difficulty_level", "intermediate")
-            
-            # Research phase tasks (always included)
-            tasks.append({
-                "title": "Goal analysis and research",
-                "description": f"Deep dive into requirements and best practices for: {goal}",
-                "priority": "high",
-                "estimated_hours": 4,
-                "category": "research",
-                "dependencies": [],
-                "tags": ["research", "planning"]
-            })
-            
-            # Learning/Skill-based goals
-            if any(word in goal_lower for word in ["learn", "skill", "study", "master", "course"]):
-                tasks.extend([
-                    {
-                        "title": "Find learning resources and courses",
-                        "description": "Research and select the best learning materials, courses, and mentors",
-                        "priority": "high",
-                        "estimated_hours": 3,
-                        "category": "research",
-                        "dependencies": [],
-                        "tags": ["learning", "resources"]
-                    },
-                    {
-                        "title": "Create structured learning plan",
-                        "description": "Develop a detailed study schedule with milestones and practice sessions",
-                        "priority": "high",
-                        "estimated_hours": 2,
-                        "category": "planning",
-                        "dependencies": ["Find learning resources and courses"],
-                        "tags": ["planning", "schedule"]
-                    },
-                    {
-                        "title": "Set up practice environment",
-                        "description": "Create dedicated space and tools for consistent practice",
-                        "priority": "medium",
-                        "estimated_hours": 2,
-                        "category": "setup",
-                        "dependencies": ["Create structured learning plan"],
-                        "tags": ["setup", "environment"]
-                    },
-                    {
-                        "title": "Regular practice and application",
-                        "description": "Consistent daily/weekly practice sessions with real-world application",
-                        "priority": "medium",
-                        "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 5,
-                        "category": "execution",
-                        "dependencies": ["Set up practice environment"],
-                        "tags": ["practice", "execution"]
-                    }
-                ])
-            
-            # Business/Startup goals
-            elif any(word in goal_lower for word in ["business", "startup", "company", "entrepreneur", "launch"]):
-                tasks.extend([
-                    {
-                        "title": "Market research and validation",
-                        "description": "Analyze target market, competition, and validate business idea",
-                        "priority": "high",
-                        "estimated_hours": 12,
-                        "category": "research",
-                        "dependencies": [],
-                        "tags": ["market", "research", "validation"]
-                    },
-                    {
-                        "title": "Business model development",
-                        "description": "Create comprehensive business plan with revenue model and strategy",
-                        "priority": "high",
-                        "estimated_hours": 16,
-                        "category": "planning",
-                        "dependencies": ["Market research and validation"],
-                        "tags": ["business-plan", "strategy"]
-                    },
-                    {
-                        "title": "MVP development and testing",
-                        "description": "Build minimum viable product and gather user feedback",
-                        "priority": "high",
-                        "estimated_hours": 40,
-                        "category": "development",
-                        "dependencies": ["Business model development"],
-                        "tags": ["mvp", "development", "testing"]
-                    },
-                    {
-                        "title": "Funding and legal setup",
-                        "description": "Secure funding, register business, and handle legal requirements",
-                        "priority": "medium",
-                        "estimated_hours": 8,
-                        "category": "legal",
-                        "dependencies": ["MVP development and testing"],
-                        "tags": ["funding", "legal"]
-                    }
-                ])
-            
-            # Health/Fitness goals
-            elif any(word in goal_lower for word in ["fitness", "health", "exercise", "diet", "weight", "workout"]):
-                tasks.extend([
-                    {
-                        "title": "Health assessment and goal setting",
-                        "description": "Evaluate current fitness level and set specific, measurable goals",
-                        "priority": "high",
-                        "estimated_hours": 2,
-                        "category": "assessment",
-                        "dependencies": [],
-                        "tags": ["health", "assessment"]
-                    },
-                    {
-                        "title": "Create personalized fitness plan",
-                        "description": "Design workout routine and nutrition plan tailored to goals",
-                        "priority": "high",
-                        "estimated_hours": 3,
-                        "category": "planning",
-                        "dependencies": ["Health assessment and goal setting"],
-                        "tags": ["fitness", "planning"]
-                    },
-                    {
-                        "title": "Set up tracking and accountability",
-                        "description": "Implement progress tracking system and find accountability partner",
-                        "priority": "medium",
-                        "estimated_hours": 2,
-                        "category": "setup",
-                        "dependencies": ["Create personalized fitness plan"],
-                        "tags": ["tracking", "accountability"]
-                    },
-                    {
-                        "title": "Consistent execution and monitoring",
-                        "description": "Follow fitness plan and regularly assess progress",
-                        "priority": "medium",
-                        "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 3,
-                        "category": "execution",
-                        "dependencies": ["Set up tracking and accountability"],
-                        "tags": ["execution", "monitoring"]
-                    }
-                ])
-            
-            # Creative goals
-            elif any(word in goal_lower for word in ["create", "build", "design", "write", "paint", "art", "content"]):
-                tasks.extend([
-                    {
-                        "title": "Creative research and inspiration",
-                        "description": "Study similar works, gather inspiration, and understand techniques",
-                        "priority": "high",
-                        "estimated_hours": 4,
-                        "category": "research",
-                        "dependencies": [],
-                        "tags": ["creative", "research", "inspiration"]
-                    },
-                    {
-                        "title": "Develop creative concept and style",
-                        "description": "Define unique approach, style, and creative direction",
-                        "priority": "high",
-                        "estimated_hours": 6,
-                        "category": "planning",
-                        "dependencies": ["Creative research and inspiration"],
-                        "tags": ["concept", "style", "planning"]
-                    },
-                    {
-                        "title": "Create initial prototypes or drafts",
-                        "description": "Develop first versions and iterate based on feedback",
-                        "priority": "medium",
-                        "estimated_hours": 12,
-                        "category": "creation",
-                        "dependencies": ["Develop creative concept and style"],
-                        "tags": ["prototype", "creation"]
-                    },
-                    {
-                        "title": "Refine and finalize work",
-                        "description": "Polish and complete the creative project",
-                        "priority": "medium",
-                        "estimated_hours": 8,
-                        "category": "refinement",
-                        "dependencies": ["Create initial prototypes or drafts"],
-                        "tags": ["refinement", "finalization"]
-                    }
-                ])
-            
-            # Generic execution and monitoring tasks
-            tasks.extend([
-                {
-                    "title": "Set up progress tracking system",
-                    "description": "Create dashboard or system to monitor progress and milestones",
-                    "priority": "medium",
-                    "estimated_hours": 2,
-                    "category": "setup",
-                    "dependencies": [],
-                    "tags": ["tracking", "setup"]
-                },
-                {
-                    "title": "Regular progress reviews and adjustments",
-                    "description": "Weekly/monthly assessments and plan modifications as needed",
-                    "priority": "medium",
-                    "estimated_hours": complexity.get("estimated_duration_weeks", 4) * 1,
-                    "category": "monitoring",
-                    "dependencies": ["Set up progress tracking system"],
-                    "tags": ["review", "adjustment"]
-                }
-            ])
-            
-            return tasks
+            return goal_tools.generate_task_breakdown(goal, timeframe, complexity)
         
         @Tool(
             name="create_execution_timeline",
@@ -386,153 +235,367 @@ class DreamTaskAgent:
         )
         def create_execution_timeline(tasks: List[Dict[str, Any]], timeframe: str) -> Dict[str, Any]:
             """Create execution timeline with scheduling"""
-            
-            # Parse timeframe
-            timeframe_days = 30  # default
-            if "week" in timeframe.lower():
-                timeframe_days = int(timeframe.split()[0]) * 7 if timeframe.split()[0].isdigit() else 7
-            elif "month" in timeframe.lower():
-                timeframe_days = int(timeframe.split()[0]) * 30 if timeframe.split()[0].isdigit() else 30
-            elif "year" in timeframe.lower():
-                timeframe_days = int(timeframe.split()[0]) * 365 if timeframe.split()[0].isdigit() else 365
-            
-            # Calculate timeline
-            total_hours = sum(task.get("estimated_hours", 1) for task in tasks)
-            hours_per_week = min(20, total_hours / (timeframe_days / 7))  # Max 20 hours per week
-            
-            timeline = {
-                "total_duration_days": timeframe_days,
-                "total_estimated_hours": total_hours,
-                "hours_per_week": hours_per_week,
-                "weekly_schedule": [],
-                "milestones": []
-            }
-            
-            # Create weekly breakdown
-            current_date = datetime.now()
-            for week in range(int(timeframe_days / 7)):
-                week_start = current_date + timedelta(weeks=week)
-                week_tasks = tasks[week:week+2] if week < len(tasks) else []
-                
-                timeline["weekly_schedule"].append({
-                    "week": week + 1,
-                    "start_date": week_start.isoformat(),
-                    "tasks": [task["title"] for task in week_tasks],
-                    "focus_area": week_tasks[0]["category"] if week_tasks else "review"
-                })
-            
-            # Add milestones
-            milestone_intervals = max(1, int(timeframe_days / 30))  # Monthly milestones
-            for i in range(0, timeframe_days, milestone_intervals):
-                milestone_date = current_date + timedelta(days=i)
-                timeline["milestones"].append({
-                    "date": milestone_date.isoformat(),
-                    "title": f"Milestone {i//milestone_intervals + 1}",
-                    "description": "Review progress and adjust plan"
-                })
-            
-            return timeline
+            return goal_tools.create_execution_timeline(tasks, timeframe)
         
         # Register tools with the tool registry
         self.tool_registry.register_tool(analyze_goal_complexity)
         self.tool_registry.register_tool(generate_task_breakdown)
         self.tool_registry.register_tool(create_execution_timeline)
-    
-    async def process_goal(self, goal: str, timeframe: str, user_context: Optional[Dict] = None) -> Dict[str, Any]:
+
+
+_RUNTIMES: Dict[bool, AgentRuntime] = {}
+
+
+def get_runtime(enable_cloud_logging: bool = True) -> AgentRuntime:
+    """Return the process-wide runtime for this logging mode, initializing it once"""
+    runtime = _RUNTIMES.get(enable_cloud_logging)
+    if runtime is None:
+        runtime = AgentRuntime(enable_cloud_logging=enable_cloud_logging)
+        _RUNTIMES[enable_cloud_logging] = runtime
+    return runtime
+
+
+def _queue_deadline_seconds(priority: Priority) -> float:
+    """How long work of this priority may wait for LLM quota before it is dropped"""
+    defaults = {Priority.INTERACTIVE: "30", Priority.BATCH: "300", Priority.SPECULATIVE: "60"}
+    return float(os.getenv(f"LLM_DEADLINE_{priority.name}_SECONDS", defaults[priority]))
+
+
+class DreamTaskAgent:
+    """Main agent class for processing dreams into actionable tasks"""
+
+    def __init__(self, user_id: Optional[str] = None, enable_cloud_logging: bool = True,
+                 runtime: Optional[AgentRuntime] = None, session_cache: Optional[SessionCache] = None,
+                 results_store: Optional[ResultsStore] = None,
+                 goal_index: Optional[GoalSimilarityIndex] = None):
+        self.user_id = user_id or "default-user"
+        self.enable_cloud_logging = enable_cloud_logging
+
+        # Heavy state is shared per process, per-user state lives in the session cache
+        self.runtime = runtime or get_runtime(enable_cloud_logging)
+        self.config = self.runtime.config
+        self.portia = self.runtime.portia
+
+        max_bytes = os.getenv("AGENT_SESSION_CACHE_MAX_BYTES")
+        self.sessions = session_cache or SessionCache(
+            max_sessions=int(os.getenv("AGENT_SESSION_CACHE_SIZE", "1000")),
+            max_bytes=int(max_bytes) if max_bytes else None
+        )
+        self.results_store = results_store if results_store is not None else open_results_store()
+        self.goal_index = goal_index if goal_index is not None else open_goal_index(self.results_store)
+        self.similarity_threshold = float(os.getenv("GOAL_SIMILARITY_THRESHOLD", "0.8"))
+        self.prompt_builder = PromptBuilder(token_budget=int(os.getenv("PORTIA_PROMPT_TOKEN_BUDGET", "1024")))
+        self.single_flight = None
+        if os.getenv("SINGLE_FLIGHT", "on").lower() not in ("off", "false", "0"):
+            self.single_flight = SingleFlight(
+                lock_dir=os.path.join(default_data_dir(), "inflight"),
+                wait_timeout=float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120"))
+            )
+        self.router = None
+        # Shadow by default: switch to "on" once the shadow route counts look right for your traffic
+        routing_mode = os.getenv("GOAL_ROUTING", "shadow").lower()
+        if routing_mode in ("on", "shadow"):
+            self.router = GoalRouter(
+                local_below=float(os.getenv("GOAL_ROUTE_LOCAL_BELOW", "0.35")),
+                full_above=float(os.getenv("GOAL_ROUTE_FULL_ABOVE", "0.55")),
+                fast_model=os.getenv("FAST_MODEL", "google/gemini-2.5-flash-lite"),
+                shadow=routing_mode == "shadow"
+            )
+        # Set up by serve() in long-running mode
+        self.pre_planner: Optional[SpeculativePlanner] = None
+
+    def get_session(self, user_id: Optional[str] = None) -> UserSession:
+        """Look up (or create) the lightweight session for a user"""
+        return self.sessions.get(user_id or self.user_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Runtime and session cache metrics for long-running mode"""
+        return {
+            "portia_available": bool(PORTIA_AVAILABLE and self.portia),
+            "sessions": self.sessions.stats(),
+            "cloud_offload": self.runtime.cloud_shipper.stats() if self.runtime.cloud_shipper else None,
+            "results_store": self.results_store.stats() if self.results_store else None,
+            "prompts": self.prompt_builder.stats(),
+            "single_flight": self.single_flight.stats() if self.single_flight else None,
+            "rate_limiter": self.runtime.rate_limiter.stats(),
+            "router": self.router.stats() if self.router else None,
+            "pre_planner": self.pre_planner.stats() if self.pre_planner else None,
+            "guidance": self.runtime.guidance_batcher.stats() if self.runtime.guidance_batcher else None
+        }
+
+    async def process_goal(self, goal: str, timeframe: str, user_context: Optional[Dict] = None,
+                           user_id: Optional[str] = None,
+                           priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
         """Process a user's goal using Portia's agentic workflow or fallback"""
         
+        user_id = user_id or self.user_id
+        priority = Priority.parse(priority)
         print(f"[DEBUG] Processing goal: {goal}", file=sys.stderr)
         print(f"[DEBUG] Timeframe: {timeframe}", file=sys.stderr)
-        print(f"[DEBUG] User ID: {self.user_id}", file=sys.stderr)
+        print(f"[DEBUG] User ID: {user_id}", file=sys.stderr)
         print(f"[DEBUG] Portia available: {PORTIA_AVAILABLE}", file=sys.stderr)
         
         # Validate inputs
         if not goal or not timeframe:
             raise ValueError("Goal and timeframe are required")
         
+        if self.pre_planner is not None and priority != Priority.SPECULATIVE:
+            self.pre_planner.observe(goal, timeframe, self._categorize_goal(goal), priority)
+        
+        session = self.get_session(user_id)
+        self.runtime.start_background()
+        started = time.perf_counter()
+        
         # Create user context if not provided
         if not user_context:
-            user_context = {
-                "user_id": self.user_id,
-                "preferences": {
-                    "working_hours_per_week": 20,
-                    "preferred_working_days": ["monday", "tuesday", "wednesday", "thursday", "friday"],
-                    "timezone": "UTC"
-                }
-            }
+            user_context = session.build_user_context()
+        
+        # Identical concurrent requests (here or in other workers) share one planning run
+        if self.single_flight is not None:
+            key = flight_key(goal, timeframe, user_context)
+            # Never wait on another request longer than this one may wait for LLM quota
+            result, shared = await self.single_flight.do(
+                key, lambda: self._plan_goal(goal, timeframe, user_context, session, priority),
+                priority=priority, max_wait=_queue_deadline_seconds(priority)
+            )
+            if shared:
+                print(f"[DEBUG] Coalesced with in-flight request for the same goal", file=sys.stderr)
+                result = self._personalize_shared_result(result, user_id)
+        else:
+            result = await self._plan_goal(goal, timeframe, user_context, session, priority)
         
-        if PORTIA_AVAILABLE and self.portia:
+        session.record_plan(goal, timeframe, result)
+        self.sessions.update(session)
+        self._record_result(result, goal, timeframe, user_id, (time.perf_counter() - started) * 1000)
+        return result
+    
+    async def _plan_goal(self, goal: str, timeframe: str, user_context: Dict[str, Any],
+                         session: UserSession, priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """Produce a plan: reuse a similar one, run Portia, or fall back to local analysis"""
+        # Near-duplicate of a goal we already planned: adapt that plan instead of calling the LLM.
+        # Speculative runs exist to produce fresh plans for reuse, so they never reuse one themselves
+        result = None
+        if priority != Priority.SPECULATIVE:
+            result = self._reuse_similar_plan(goal, timeframe, session.user_id)
+        if result is None and PORTIA_AVAILABLE and self.portia:
+            # Simple goals go to the rule-based engine, mid-range ones to the faster model
+            routing = self.router.route(goal, timeframe) if self.router else None
+            applied = routing if routing and not routing["shadow"] else None
+            if applied and applied["route"] == ROUTE_LOCAL:
+                # Planned by the rule-based engine on purpose, not because the LLM path failed
+                result = self._fallback_goal_analysis(goal, timeframe)
+                result.update({"fallback": False, "routed_local": True, "llm_skipped": True})
+            else:
+                try:
+                    result = await self._process_with_portia(
+                        goal, timeframe, user_context, session, priority,
+                        model=applied["model"] if applied else None
+                    )
+                except Exception as e:
+                    print(f"[DEBUG] Portia processing failed: {e}", file=sys.stderr)
+                    print(f"[DEBUG] Falling back to local analysis", file=sys.stderr)
+                    result = self._fallback_goal_analysis(goal, timeframe)
+                    if isinstance(e, QueueDropped):
+                        # The rate limiter dropped it before any LLM call went out
+                        result["llm_skipped"] = True
+            if routing:
+                result["routing"] = {"route": routing["route"], "score": routing["score"], "shadow": routing["shadow"]}
+        elif result is None:
+            print(f"[DEBUG] Using fallback analysis (Portia not available)", file=sys.stderr)
+            result = self._fallback_goal_analysis(goal, timeframe)
+        
+        return result
+    
+    def _personalize_shared_result(self, result: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        """Copy another request's result for this user"""
+        personalized = copy.deepcopy(result)
+        personalized.update({
+            "user_id": user_id,
+            "coalesced": True,
+            "processed_at": datetime.now().isoformat()
+        })
+        return personalized
+    
+    def _record_result(self, result: Dict[str, Any], goal: str, timeframe: str, user_id: str,
+                       duration_ms: float) -> None:
+        """Persist a result to the local results store and index it for reuse (never fails the request)"""
+        if self.results_store is None:
+            return
+        if result.get("routed_local"):
+            provider, model = "local-routed", "rule-based"
+        elif result.get("fallback") or not self.config:
+            provider, model = "local-fallback", "rule-based"
+        else:
+            provider, model = str(self.config.llm_provider), str(result.get("model") or self.config.default_model)
+        try:
+            result_id = self.results_store.record(
+                result, goal, timeframe, user_id,
+                category=self._categorize_goal(goal),
+                provider=provider,
+                model=model,
+                duration_ms=round(duration_ms, 2)
+            )
+            if self.goal_index is not None:
+                self.goal_index.observe(result_id, goal, result)
+        except Exception as e:
+            print(f"[DEBUG] Failed to record result: {e}", file=sys.stderr)
+    
+    def _reuse_similar_plan(self, goal: str, timeframe: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Find the closest previously planned goal above the similarity threshold and adapt it"""
+        if self.goal_index is None or self.results_store is None:
+            return None
+        try:
+            category = self._categorize_goal(goal)
+            numbers = numeric_tokens(goal)
+            candidates = []
+            for result_id, similarity in self.goal_index.query(goal, k=5, min_similarity=self.similarity_threshold):
+                row = self.results_store.get(result_id)
+                # Similar wording is not enough if the goal lands in a different category or the numbers differ
+                if row is not None and row["category"] == category and numeric_tokens(row["goal"]) == numbers:
+                    candidates.append((row, similarity))
+            if candidates:
+                # Prefer a plan made for the same timeframe, e.g. one pre-planned for it
+                wanted = normalize_timeframe(timeframe)
+                row, similarity = next((c for c in candidates if c[0]["timeframe"] == wanted), candidates[0])
+                print(f"[DEBUG] Reusing plan for similar goal '{row['goal']}' (similarity {similarity:.2f})", file=sys.stderr)
+                return self._adapt_plan(row, similarity, goal, timeframe, user_id)
+        except Exception as e:
+            print(f"[DEBUG] Similar plan lookup failed: {e}", file=sys.stderr)
+        return None
+    
+    def _adapt_plan(self, row: Dict[str, Any], similarity: float, goal: str, timeframe: str,
+                    user_id: str) -> Dict[str, Any]:
+        """Re-run the deterministic tools to fit a stored plan to a new goal, timeframe and user"""
+        prior = row["result"]
+        tasks = copy.deepcopy(prior.get("tasks") or [])
+        if not tasks:
+            complexity = goal_tools.analyze_goal_complexity(goal, timeframe)
+            tasks = goal_tools.generate_task_breakdown(goal, timeframe, complexity)
+        
+        result = dict(prior)
+        result.update({
+            "success": True,
+            "run_id": None,
+            "user_id": user_id,
+            "tasks": tasks,
+            "timeline": goal_tools.create_execution_timeline(tasks, timeframe),
+            "success_tips": self._generate_success_tips(goal, timeframe),
+            "potential_obstacles": self._identify_obstacles(goal),
+            "processed_at": datetime.now().isoformat(),
+            "reused_from": {
+                "result_id": row["id"],
+                "goal": row["goal"],
+                "timeframe": row["timeframe"],
+                "similarity": round(similarity, 4)
+            }
+        })
+        return result
+    
+    async def shutdown(self) -> None:
+        """Stop background work and snapshot the goal index once enough rows would need replaying"""
+        if self.pre_planner is not None:
+            await self.pre_planner.stop()
+        await self.runtime.shutdown()
+        snapshot_every = int(os.getenv("GOAL_INDEX_SNAPSHOT_EVERY", "500"))
+        if self.goal_index is not None and self.goal_index.path and self.goal_index.unsaved_rows >= snapshot_every:
             try:
-                return await self._process_with_portia(goal, timeframe, user_context)
+                self.goal_index.save(self.goal_index.path)
             except Exception as e:
-                print(f"[DEBUG] Portia processing failed: {e}", file=sys.stderr)
-                print(f"[DEBUG] Falling back to local analysis", file=sys.stderr)
-                return self._fallback_goal_analysis(goal, timeframe)
-        else:
-            print(f"[DEBUG] Using fallback analysis (Portia not available)", file=sys.stderr)
-            return self._fallback_goal_analysis(goal, timeframe)
+                print(f"[DEBUG] Failed to save goal index: {e}", file=sys.stderr)
     
-    async def _process_with_portia(self, goal: str, timeframe: str, user_context: Optional[Dict] = None) -> Dict[str, Any]:
-        """Process goal using Portia SDK with enhanced user attribution and error handling"""
+    def _get_end_user(self, session: UserSession, goal: str, timeframe: str) -> Optional[Any]:
+        """Reuse the session's EndUser for attribution, creating it on first use"""
+        if not self.enable_cloud_logging:
+            return None
+        if not ENDUSER_AVAILABLE or EndUser is None:
+            print(f"[DEBUG] EndUser not available, skipping user attribution", file=sys.stderr)
+            return None
         
-        # Create EndUser for attribution if cloud logging is enabled and EndUser is available
-        end_user = None
-        if self.enable_cloud_logging and ENDUSER_AVAILABLE and EndUser is not None:
+        metadata = {
+            "plan": "dream-to-task",
+            "goal_type": self._categorize_goal(goal),
+            "timeframe": timeframe
+        }
+        if session.end_user is None:
             try:
-                end_user = EndUser(
-                    user_id=self.user_id,
-                    metadata={
-                        "plan": "dream-to-task",
-                        "goal_type": self._categorize_goal(goal),
-                        "timeframe": timeframe
-                    }
-                )
-                print(f"[DEBUG] Created EndUser for attribution: {self.user_id}", file=sys.stderr)
+                session.end_user = EndUser(user_id=session.user_id, metadata=metadata)
+                print(f"[DEBUG] Created EndUser for attribution: {session.user_id}", file=sys.stderr)
             except Exception as e:
                 print(f"[DEBUG] Failed to create EndUser: {e}", file=sys.stderr)
-        elif self.enable_cloud_logging and not ENDUSER_AVAILABLE:
-            print(f"[DEBUG] EndUser not available, skipping user attribution", file=sys.stderr)
+        elif isinstance(getattr(session.end_user, "metadata", None), dict):
+            session.end_user.metadata.update(metadata)
+        return session.end_user
+    
+    async def _process_with_portia(self, goal: str, timeframe: str, user_context: Optional[Dict] = None,
+                                   session: Optional[UserSession] = None,
+                                   priority: Priority = Priority.INTERACTIVE,
+                                   model: Optional[str] = None) -> Dict[str, Any]:
+        """Process goal using Portia SDK with enhanced user attribution and error handling"""
+        
+        session = session or self.get_session()
+        portia = self.runtime.portia_for_model(model)
         
-        # Create a comprehensive prompt for goal processing
-        prompt = f"""
-        I need help turning my dream/goal into an actionable plan. Here are the details:
+        # Reuse the session's EndUser for attribution if cloud logging is enabled
+        end_user = self._get_end_user(session, goal, timeframe)
         
-        Goal: {goal}
-        Timeframe: {timeframe}
-        User Context: {json.dumps(user_context or {}, indent=2)}
+        # Compact, budgeted prompt for goal processing
+        built = self.prompt_builder.build(goal, timeframe, user_context)
+        prompt = built["prompt"]
+        print(f"[DEBUG] Prompt tokens (estimated): {built['tokens']}/{self.prompt_builder.token_budget}", file=sys.stderr)
+        if built["dropped_context"] or built["truncated_goal"]:
+            print(f"[DEBUG] Prompt over budget: dropped context {built['dropped_context']}, "
+                  f"goal truncated: {built['truncated_goal']}", file=sys.stderr)
         
-        Please help me by:
-        1. Analyzing the complexity and feasibility of this goal using the analyze_goal_complexity tool
-        2. Breaking it down into specific, actionable tasks with priorities using the generate_task_breakdown tool
-        3. Creating a realistic execution timeline with milestones using the create_execution_timeline tool
-        4. Providing success tips and potential obstacles to watch out for
+        # Tips and obstacles are generated alongside the plan (batched with other requests)
+        guidance_task = asyncio.ensure_future(self._generate_guidance(goal, timeframe, priority))
         
-        Use the available tools to provide a comprehensive analysis and action plan.
-        Be specific and actionable in your recommendations.
-        """
+        # Both LLM phases share the request's deadline in the rate limiter queue
+        limiter = self.runtime.rate_limiter
+        deadline = time.monotonic() + _queue_deadline_seconds(priority)
+        call_tokens = built["tokens"] + int(os.getenv("LLM_COMPLETION_TOKENS", "1024"))
+        run_requests = int(os.getenv("LLM_RUN_PLAN_REQUESTS", "3"))
+        plan = plan_run = None
         
         try:
             # Generate plan using Portia
             print(f"[DEBUG] Generating plan with Portia...", file=sys.stderr)
-            plan = await self.portia.generate_plan(prompt)
+            plan = await limiter.call(
+                lambda: portia.generate_plan(prompt),
+                tokens=call_tokens, priority=priority, deadline=deadline
+            )
             print(f"[DEBUG] Plan generated successfully", file=sys.stderr)
             
-            # Execute the plan
+            # Execute the plan (one LLM call per step, roughly)
             print(f"[DEBUG] Executing plan...", file=sys.stderr)
-            plan_run = await self.portia.run_plan(plan)
+            if end_user is not None:
+                run = lambda: portia.run_plan(plan, end_user=end_user)
+            else:
+                run = lambda: portia.run_plan(plan)
+            try:
+                plan_run = await limiter.call(
+                    run, tokens=call_tokens * run_requests, priority=priority,
+                    deadline=deadline, requests=run_requests
+                )
+            except QueueDropped as e:
+                # The plan call already went out, so this request did spend quota
+                raise RateLimitExceeded(str(e)) from e
             print(f"[DEBUG] Plan execution completed", file=sys.stderr)
+            self.runtime.offload_run(plan, plan_run, portia)
+            guidance = await guidance_task
             
             # Extract results from plan run
             result = {
                 "success": True,
                 "plan_id": plan.id if hasattr(plan, 'id') else None,
                 "run_id": plan_run.id if hasattr(plan_run, 'id') else None,
-                "user_id": self.user_id,
+                "user_id": session.user_id,
                 "analysis": self._extract_analysis_from_run(plan_run),
                 "tasks": self._extract_tasks_from_run(plan_run),
                 "timeline": self._extract_timeline_from_run(plan_run),
-                "success_tips": self._generate_success_tips(goal, timeframe),
-                "potential_obstacles": self._identify_obstacles(goal),
+                "success_tips": guidance["success_tips"],
+                "potential_obstacles": guidance["potential_obstacles"],
+                "prompt_tokens": built["tokens"],
+                "model": model or str(self.config.default_model),
                 "processed_at": datetime.now().isoformat()
             }
             
@@ -541,7 +604,34 @@ class DreamTaskAgent:
             
         except Exception as e:
             print(f"[DEBUG] Error during Portia processing: {e}", file=sys.stderr)
+            self.runtime.release_run(portia, plan, plan_run)
             raise e
+        except asyncio.CancelledError:
+            self.runtime.release_run(portia, plan, plan_run)
+            raise
+        finally:
+            # No-op once the guidance was awaited; otherwise the batcher stops the batched LLM call
+            # when every request in the batch has been cancelled
+            guidance_task.cancel()
+    
+    async def _generate_guidance(self, goal: str, timeframe: str,
+                                 priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """Success tips and obstacles from the batched LLM call, or the built-in lists"""
+        batcher = self.runtime.guidance_batcher
+        if batcher is not None:
+            try:
+                guidance = await asyncio.wait_for(
+                    batcher.submit({"goal": goal, "timeframe": timeframe, "priority": priority}),
+                    timeout=float(os.getenv("GUIDANCE_TIMEOUT_SECONDS", "15"))
+                )
+                if guidance:
+                    return guidance
+            except Exception as e:
+                print(f"[DEBUG] Generated guidance unavailable, using built-in tips: {e}", file=sys.stderr)
+        return {
+            "success_tips": self._generate_success_tips(goal, timeframe),
+            "potential_obstacles": self._identify_obstacles(goal)
+        }
     
     def _extract_analysis_from_run(self, plan_run: Any) -> Dict[str, Any]:
         """Extract goal analysis from plan run results"""
@@ -612,113 +702,10 @@ class DreamTaskAgent:
         elif any(word in goal.lower() for word in ["simple", "basic", "easy", "quick"]):
             complexity_level = "beginner"
         
-        # Generate tasks based on goal content
-        tasks = []
-        
-        # Research phase tasks
-        tasks.append({
-            "title": "Research and planning",
-            "description": f"Research requirements and create detailed plan for: {goal}",
-            "priority": "high",
-            "category": "research",
-            "estimated_hours": 4
-        })
-        
-        # Skill-based goals
-        if any(word in goal.lower() for word in ["learn", "skill", "study", "course"]):
-            tasks.extend([
-                {
-                    "title": "Find learning resources",
-                    "description": "Identify courses, books, tutorials, and mentors",
-                    "priority": "high",
-                    "category": "research",
-                    "estimated_hours": 3
-                },
-                {
-                    "title": "Create study schedule",
-                    "description": "Plan daily/weekly learning sessions",
-                    "priority": "high",
-                    "category": "planning",
-                    "estimated_hours": 2
-                },
-                {
-                    "title": "Practice regularly",
-                    "description": "Consistent practice and application of new skills",
-                    "priority": "medium",
-                    "category": "execution",
-                    "estimated_hours": 20
-                }
-            ])
-        
-        # Business/project goals
-        if any(word in goal.lower() for word in ["business", "startup", "project", "build", "create"]):
-            tasks.extend([
-                {
-                    "title": "Market analysis",
-                    "description": "Analyze target market and competition",
-                    "priority": "high",
-                    "category": "research",
-                    "estimated_hours": 6
-                },
-                {
-                    "title": "Create prototype/MVP",
-                    "description": "Build minimum viable version",
-                    "priority": "medium",
-                    "category": "execution",
-                    "estimated_hours": 15
-                },
-                {
-                    "title": "Test and iterate",
-                    "description": "Get feedback and improve",
-                    "priority": "medium",
-                    "category": "testing",
-                    "estimated_hours": 8
-                }
-            ])
-        
-        # Health/fitness goals
-        if any(word in goal.lower() for word in ["fitness", "health", "exercise", "diet", "weight"]):
-            tasks.extend([
-                {
-                    "title": "Assess current state",
-                    "description": "Evaluate current fitness/health level",
-                    "priority": "high",
-                    "category": "assessment",
-                    "estimated_hours": 2
-                },
-                {
-                    "title": "Create workout/diet plan",
-                    "description": "Design sustainable routine",
-                    "priority": "high",
-                    "category": "planning",
-                    "estimated_hours": 3
-                },
-                {
-                    "title": "Track progress",
-                    "description": "Monitor and adjust plan regularly",
-                    "priority": "medium",
-                    "category": "monitoring",
-                    "estimated_hours": 1
-                }
-            ])
-        
-        # Add generic execution tasks
-        tasks.extend([
-            {
-                "title": "Set up tracking system",
-                "description": "Create system to monitor progress and milestones",
-                "priority": "medium",
-                "category": "planning",
-                "estimated_hours": 2
-            },
-            {
-                "title": "Regular review and adjustment",
-                "description": "Weekly/monthly progress reviews and plan adjustments",
-                "priority": "medium",
-                "category": "monitoring",
-                "estimated_hours": 4
-            }
-        ])
+        # Generate tasks for every matching category from the shared template registry
+        complexity = goal_tools.analyze_goal_complexity(goal, timeframe)
+        tasks = get_registry().build_tasks(goal, complexity.get("estimated_duration_weeks", 4),
+                                           match_all=True, fallback=True)
         
         # Calculate timeline
         total_hours = sum(task.get("estimated_hours", 1) for task in tasks)
@@ -816,28 +803,101 @@ class DreamTaskAgent:
     
     def _categorize_goal(self, goal: str) -> str:
         """Categorize the goal type for better analysis"""
-        goal_lower = goal.lower()
-        
-        if any(word in goal_lower for word in ["learn", "skill", "study", "master", "course"]):
-            return "learning"
-        elif any(word in goal_lower for word in ["business", "startup", "company", "entrepreneur"]):
-            return "business"
-        elif any(word in goal_lower for word in ["fitness", "health", "exercise", "diet", "weight"]):
-            return "health"
-        elif any(word in goal_lower for word in ["create", "build", "design", "write", "paint", "art"]):
-            return "creative"
-        elif any(word in goal_lower for word in ["travel", "visit", "explore"]):
-            return "travel"
-        elif any(word in goal_lower for word in ["save", "invest", "money", "financial"]):
-            return "financial"
-        else:
-            return "general"
+        return goal_tools.categorize_goal(goal)
+
+async def serve():
+    """Long-running mode: read JSON requests from stdin, write one JSON result per line to stdout"""
+    enable_cloud_logging = os.getenv("PORTIA_CLOUD_LOGGING", "true").lower() == "true"
+    # The process outlives each request, so cloud records can be shipped in the background
+    os.environ.setdefault("PORTIA_CLOUD_LOGGING_MODE", "async")
+    agent = DreamTaskAgent(enable_cloud_logging=enable_cloud_logging)
+    loop = asyncio.get_running_loop()
+    
+    # Pre-plan trending goals while idle (only worthwhile when plans come from the LLM)
+    if PORTIA_AVAILABLE and agent.portia and os.getenv("SPECULATIVE_PLANNING", "on").lower() not in ("off", "false", "0"):
+        timeframes = os.getenv("SPECULATIVE_TIMEFRAMES")
+        agent.pre_planner = SpeculativePlanner(
+            agent,
+            top_n=int(os.getenv("SPECULATIVE_TOP_N", "20")),
+            timeframes=tuple(t.strip() for t in timeframes.split(",")) if timeframes else CANONICAL_TIMEFRAMES,
+            calls_per_hour=int(os.getenv("SPECULATIVE_LLM_CALLS_PER_HOUR", "60")),
+            calls_per_plan=1 + int(os.getenv("LLM_RUN_PLAN_REQUESTS", "3")),
+            idle_seconds=float(os.getenv("SPECULATIVE_IDLE_SECONDS", "30")),
+            min_requests=float(os.getenv("SPECULATIVE_MIN_REQUESTS", "2"))
+        )
+        agent.pre_planner.start()
+    pending = set()
+    
+    def respond(request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        if "request_id" in request:
+            response["request_id"] = request["request_id"]
+        print(json.dumps(response), flush=True)
+    
+    async def handle(request: Dict[str, Any]) -> None:
+        try:
+            if request.get("command") == "stats":
+                response = {"success": True, "stats": agent.get_stats()}
+            else:
+                response = await agent.process_goal(
+                    request.get("goal", ""),
+                    request.get("timeframe", ""),
+                    user_context=request.get("user_context"),
+                    user_id=request.get("user_id"),
+                    priority=request.get("priority", Priority.INTERACTIVE)
+                )
+        except asyncio.CancelledError:
+            # Never leave a client without a response line, but let the cancellation through
+            print(f"[DEBUG] Request cancelled before completion", file=sys.stderr)
+            respond(request, {
+                "success": False,
+                "error": "Request cancelled before completion",
+                "fallback": True,
+                "processed_at": datetime.now().isoformat()
+            })
+            raise
+        except Exception as e:
+            print(f"[DEBUG] Error serving request: {e}", file=sys.stderr)
+            response = {
+                "success": False,
+                "error": str(e),
+                "fallback": True,
+                "processed_at": datetime.now().isoformat()
+            }
+        respond(request, response)
+    
+    print("[DEBUG] Serving requests from stdin", file=sys.stderr)
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(json.dumps({"success": False, "error": f"Invalid JSON request: {e}"}), flush=True)
+            continue
+        task = asyncio.create_task(handle(request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    if pending:
+        # A cancelled request has already answered; don't let it skip the shutdown below
+        await asyncio.gather(*pending, return_exceptions=True)
+    await agent.shutdown()
+    print(f"[DEBUG] Session stats: {json.dumps(agent.get_stats()['sessions'])}", file=sys.stderr)
 
 async def main():
     """Main function for command-line usage with enhanced error handling"""
     try:
+        if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+            await serve()
+            return
+        
         if len(sys.argv) < 3:
             print("Usage: python portia_agent.py <goal> <timeframe> [user_id] [enable_cloud_logging]")
+            print("       python portia_agent.py --serve  (long-running mode, JSON lines on stdin)")
             print("Example: python portia_agent.py 'Learn to play guitar' '3-months' 'user123' 'true'")
             sys.exit(1)
         
@@ -859,7 +919,9 @@ async def main():
         result = await agent.process_goal(goal, timeframe)
         
         print(f"[DEBUG] Goal processing completed successfully", file=sys.stderr)
-        print(json.dumps(result, indent=2))
+        print(json.dumps(result, indent=2), flush=True)
+        
+        await agent.shutdown()
         
     except Exception as e:
         print(f"[DEBUG] Error in main: {e}", file=sys.stderr)
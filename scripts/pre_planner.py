@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Speculative pre-planning for long-running mode
+Tracks request demand per normalized goal and category, and while the agent is idle
+plans the most requested goal/timeframe pairs at speculative priority so the first
+real request for them is served by plan reuse instead of a full LLM run.
+"""
+
+import sys
+import time
+import asyncio
+from collections import deque, Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+from results_store import normalize_goal, normalize_timeframe
+from similarity_index import is_reusable
+from goal_router import score_goal
+from rate_limiter import Priority
+
+CANONICAL_TIMEFRAMES = ("1 month", "3 months", "6 months")
+
+
+class DemandTracker:
+    """Exponentially decayed request counts per normalized goal and per category"""
+
+    def __init__(self, half_life_seconds: float = 6 * 3600, max_goals: int = 5000):
+        self.half_life_seconds = half_life_seconds
+        self.max_goals = max_goals
+        self._goals: Dict[str, Dict[str, Any]] = {}
+        self._categories: Dict[str, Tuple[float, float]] = {}
+
+    def _decayed(self, score: float, updated: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated) / self.half_life_seconds)
+
+    def observe(self, goal: str, timeframe: str, category: str) -> None:
+        now = time.time()
+        key = normalize_goal(goal)
+        entry = self._goals.get(key)
+        if entry is None:
+            entry = self._goals[key] = {"goal": goal, "category": category, "score": 0.0,
+                                        "updated": now, "timeframes": Counter()}
+        entry["score"] = self._decayed(entry["score"], entry["updated"], now) + 1.0
+        entry["updated"] = now
+        entry["goal"] = goal
+        entry["timeframes"][normalize_timeframe(timeframe)] += 1
+
+        score, updated = self._categories.get(category, (0.0, now))
+        self._categories[category] = (self._decayed(score, updated, now) + 1.0, now)
+
+        if len(self._goals) > self.max_goals:
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        # Keep the busier half
+        ranked = sorted(self._goals, key=lambda k: self._decayed(self._goals[k]["score"], self._goals[k]["updated"], now))
+        for key in ranked[:len(ranked) // 2]:
+            del self._goals[key]
+
+    def top_goals(self, n: int, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """Most requested goals right now, each with its decayed score and timeframe counts"""
+        now = time.time()
+        ranked = []
+        for entry in self._goals.values():
+            score = self._decayed(entry["score"], entry["updated"], now)
+            if score >= min_score:
+                ranked.append({**entry, "score": score})
+        ranked.sort(key=lambda e: e["score"], reverse=True)
+        return ranked[:n]
+
+    def top_categories(self, n: int = 5) -> Dict[str, float]:
+        now = time.time()
+        scores = {c: self._decayed(s, u, now) for c, (s, u) in self._categories.items()}
+        return {c: round(s, 2) for c, s in sorted(scores.items(), key=lambda i: i[1], reverse=True)[:n]}
+
+    def __len__(self) -> int:
+        return len(self._goals)
+
+
+class SpeculativePlanner:
+    """Background loop that pre-plans trending goals during idle time within an LLM call budget"""
+
+    def __init__(self, agent: Any, top_n: int = 20, timeframes: Tuple[str, ...] = CANONICAL_TIMEFRAMES,
+                 calls_per_hour: int = 60, calls_per_plan: int = 4, idle_seconds: float = 30.0,
+                 refresh_seconds: float = 24 * 3600, min_requests: float = 2.0,
+                 poll_interval: float = 1.0, tracker: Optional[DemandTracker] = None):
+        self.agent = agent
+        self.tracker = tracker or DemandTracker()
+        self.top_n = top_n
+        self.timeframes = tuple(normalize_timeframe(t) for t in timeframes)
+        self.calls_per_hour = calls_per_hour
+        self.calls_per_plan = calls_per_plan
+        self.idle_seconds = idle_seconds
+        self.refresh_seconds = refresh_seconds
+        self.min_requests = min_requests
+        self.poll_interval = poll_interval
+        self._calls: deque = deque()
+        self._attempted: Dict[Tuple[str, str], float] = {}
+        self._last_interactive = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.planned = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.skipped_budget = 0
+
+    def observe(self, goal: str, timeframe: str, category: str, priority: Priority) -> None:
+        """Count a real request; interactive ones preempt any speculative run"""
+        self.tracker.observe(goal, timeframe, category)
+        if priority != Priority.INTERACTIVE:
+            return
+        self._last_interactive = time.monotonic()
+        # Even for the same goal: the interactive request plans it itself rather than wait on
+        # speculative work (single-flight never lets it follow a less urgent leader)
+        if self._current is not None and not self._current.done():
+            print("[DEBUG] Interactive request arrived, cancelling speculative planning", file=sys.stderr)
+            self._current.cancel()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in (self._current, self._task):
+            if task is not None and not task.done():
+                task.cancel()
+        for task in (self._current, self._task):
+            if task is not None:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._task = None
+
+    def _idle(self) -> bool:
+        if time.monotonic() - self._last_interactive < self.idle_seconds:
+            return False
+        return self.agent.runtime.rate_limiter.stats()["waiting"] == 0
+
+    def _calls_last_hour(self) -> int:
+        cutoff = time.monotonic() - 3600
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+        return sum(cost for _at, cost in self._calls)
+
+    def _already_planned(self, goal: str, timeframe: str) -> bool:
+        store = self.agent.results_store
+        if store is None:
+            return False
+        cutoff = time.time() - self.refresh_seconds
+        return any(
+            row["created_at"] >= cutoff and is_reusable(row["result"])
+            for row in store.by_goal(goal, timeframe, limit=5)
+        )
+
+    def _next_candidate(self) -> Optional[Tuple[str, str]]:
+        """Highest-demand goal/timeframe pair that isn't planned yet and needs the LLM"""
+        now = time.time()
+        pairs = 0
+        router = self.agent.router
+        for entry in self.tracker.top_goals(self.top_n, min_score=self.min_requests):
+            # Most requested timeframes first, then the canonical ones
+            timeframes = [t for t, _count in entry["timeframes"].most_common()]
+            timeframes += [t for t in self.timeframes if t not in timeframes]
+            for timeframe in timeframes:
+                if pairs >= self.top_n:
+                    return None
+                pairs += 1
+                key = (normalize_goal(entry["goal"]), timeframe)
+                if now - self._attempted.get(key, 0.0) < self.refresh_seconds:
+                    continue
+                # Goals the router sends to the rule-based engine are cheap already
+                # (in shadow mode they still get the full LLM plan, so pre-plan them)
+                if router is not None and not router.shadow and score_goal(entry["goal"], timeframe)["score"] < router.local_below:
+                    self._attempted[key] = now
+                    continue
+                if self._already_planned(entry["goal"], timeframe):
+                    self._attempted[key] = now
+                    continue
+                return entry["goal"], timeframe
+        return None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.poll_interval)
+            if not self._idle():
+                continue
+            try:
+                candidate = self._next_candidate()
+            except Exception as e:
+                print(f"[DEBUG] Speculative candidate selection failed: {e}", file=sys.stderr)
+                continue
+            if candidate is None:
+                continue
+            if self._calls_last_hour() + self.calls_per_plan > self.calls_per_hour:
+                self.skipped_budget += 1
+                continue
+
+            goal, timeframe = candidate
+            key = (normalize_goal(goal), timeframe)
+            self._attempted[key] = time.time()
+            self._calls.append((time.monotonic(), self.calls_per_plan))
+            print(f"[DEBUG] Speculatively planning '{goal}' ({timeframe})", file=sys.stderr)
+            self._current = asyncio.get_running_loop().create_task(self.agent.process_goal(
+                goal, timeframe, user_id="speculative-planner", priority=Priority.SPECULATIVE
+            ))
+            try:
+                result = await self._current
+                if result.get("llm_skipped"):
+                    # Routed locally or dropped by the rate limiter: no LLM call was made
+                    self._calls.pop()
+                    self.failed += 1
+                elif result.get("fallback"):
+                    # The LLM was called (and billed) but the plan failed
+                    self.failed += 1
+                else:
+                    self.planned += 1
+            except asyncio.CancelledError:
+                if self._stopping:
+                    raise
+                self.cancelled += 1
+                # Preempted before finishing: try again on the next idle period
+                self._attempted.pop(key, None)
+            except Exception as e:
+                print(f"[DEBUG] Speculative planning failed: {e}", file=sys.stderr)
+                self.failed += 1
+            finally:
+                self._current = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "tracked_goals": len(self.tracker),
+            "top_goals": [
+                {"goal": e["goal"], "category": e["category"], "score": round(e["score"], 2)}
+                for e in self.tracker.top_goals(5)
+            ],
+            "top_categories": self.tracker.top_categories(),
+            "planned": self.planned,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "llm_calls_last_hour": self._calls_last_hour(),
+            "llm_calls_per_hour": self.calls_per_hour
+        }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compact planning prompts with a local token estimator and a configurable token budget
+"""
+
+import re
+import json
+from typing import Dict, List, Any, Optional
+
+from session_cache import DEFAULT_PREFERENCES
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+INSTRUCTIONS = (
+    "Turn this goal into an actionable plan. "
+    "1) analyze_goal_complexity 2) generate_task_breakdown "
+    "3) create_execution_timeline 4) list success tips and obstacles. Be specific."
+)
+
+# The goal is never shortened below this many tokens, even if that breaks the budget
+MIN_GOAL_TOKENS = 16
+
+# Context keys dropped first when the prompt is over budget
+_DROP_ORDER = ("history", "recent_plans", "notes", "preferences")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count: ~4 characters per word piece, 1 per punctuation mark"""
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        tokens += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+    return tokens
+
+
+def compact_context(user_context: Optional[Dict[str, Any]],
+                    defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Drop empty values, the user id and preferences equal to the defaults"""
+    defaults = DEFAULT_PREFERENCES if defaults is None else defaults
+    compact = {}
+    for key, value in (user_context or {}).items():
+        # Attribution goes through EndUser, the LLM doesn't need the id
+        if key == "user_id" or value in (None, "", [], {}):
+            continue
+        if key == "preferences" and isinstance(value, dict):
+            value = {k: v for k, v in value.items() if defaults.get(k) != v and v not in (None, "", [], {})}
+            if not value:
+                continue
+        compact[key] = value
+    return compact
+
+
+def encode_context(context: Dict[str, Any]) -> str:
+    return json.dumps(context, separators=(",", ":"), sort_keys=True, default=str)
+
+
+class PromptBuilder:
+    """Builds the planning prompt and enforces a token budget"""
+
+    def __init__(self, token_budget: int = 1024):
+        self.token_budget = token_budget
+        self.prompts_built = 0
+        self.total_tokens = 0
+        self.over_budget = 0
+
+    def build(self, goal: str, timeframe: str, user_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return {"prompt", "tokens", "dropped_context", "truncated_goal"}"""
+        context = compact_context(user_context)
+        dropped: List[str] = []
+
+        prompt = self._render(goal, timeframe, context)
+        tokens = estimate_tokens(prompt)
+        if tokens > self.token_budget:
+            self.over_budget += 1
+
+        # Shed context, least useful keys first, then whatever is left
+        drop_order = [k for k in _DROP_ORDER if k in context] + sorted(k for k in context if k not in _DROP_ORDER)
+        while tokens > self.token_budget and drop_order:
+            key = drop_order.pop(0)
+            context.pop(key)
+            dropped.append(key)
+            prompt = self._render(goal, timeframe, context)
+            tokens = estimate_tokens(prompt)
+
+        # Last resort: shorten the goal text itself
+        truncated = False
+        if tokens > self.token_budget:
+            overshoot = tokens - self.token_budget
+            words = goal.split()
+            goal_tokens = estimate_tokens(goal)
+            while words and overshoot > 0 and goal_tokens > MIN_GOAL_TOKENS:
+                removed = estimate_tokens(words.pop())
+                overshoot -= removed
+                goal_tokens -= removed
+            truncated = len(words) < len(goal.split())
+            if truncated:
+                goal = " ".join(words)
+                prompt = self._render(goal, timeframe, context)
+                tokens = estimate_tokens(prompt)
+
+        self.prompts_built += 1
+        self.total_tokens += tokens
+        return {
+            "prompt": prompt,
+            "tokens": tokens,
+            "dropped_context": dropped,
+            "truncated_goal": truncated
+        }
+
+    def _render(self, goal: str, timeframe: str, context: Dict[str, Any]) -> str:
+        lines = [INSTRUCTIONS, f"Goal: {goal}", f"Timeframe: {timeframe}"]
+        if context:
+            lines.append(f"Context: {encode_context(context)}")
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "prompts_built": self.prompts_built,
+            "avg_prompt_tokens": round(self.total_tokens / self.prompts_built, 1) if self.prompts_built else 0.0,
+            "over_budget": self.over_budget
+        }
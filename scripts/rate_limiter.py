@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Quota-aware rate limiting for LLM calls
+Token buckets for requests/min and tokens/min shared by all callers in the process, a
+priority queue (interactive > batch > speculative) with deadlines, and retry-after
+handling for 429 / quota errors.
+"""
+
+import re
+import sys
+import time
+import heapq
+import asyncio
+import itertools
+from enum import IntEnum
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+    SPECULATIVE = 2
+
+    @classmethod
+    def parse(cls, value: Any) -> "Priority":
+        if isinstance(value, Priority):
+            return value
+        if isinstance(value, str):
+            try:
+                return cls[value.strip().upper()]
+            except KeyError:
+                raise ValueError(f"Unknown priority '{value}' (expected interactive, batch or speculative)")
+        return cls(int(value))
+
+
+class RateLimitExceeded(Exception):
+    """Work dropped because its deadline passed or the queue was full"""
+
+
+class QueueDropped(RateLimitExceeded):
+    """Dropped from the queue before quota was granted, so no LLM call was made"""
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously up to capacity"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "requests", "tokens", "deadline", "future")
+
+    def __init__(self, priority: Priority, seq: int, requests: int, tokens: int,
+                 deadline: Optional[float], future: "asyncio.Future"):
+        self.priority = priority
+        self.seq = seq
+        self.requests = requests
+        self.tokens = tokens
+        self.deadline = deadline
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+_RETRY_PATTERNS = (
+    re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry (?:in|after)\s*([\d.]+)\s*s", re.IGNORECASE),
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for HTTP 429 / quota exhaustion errors from the LLM provider"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource_exhausted" in text or "rate limit" in text or "quota" in text
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-suggested wait from the error, if it carries one"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if "retry-after" in headers:
+        try:
+            return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class QuotaRateLimiter:
+    """Shared requests/min + tokens/min limiter with priority queueing"""
+
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = 1_000_000,
+                 max_queue: int = 1000, max_retries: int = 3):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.queued = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.retried = 0
+        self.queued_by_priority = {p.name.lower(): 0 for p in Priority}
+        self.dropped_by_priority = {p.name.lower(): 0 for p in Priority}
+
+    async def acquire(self, tokens: int = 0, priority: Priority = Priority.INTERACTIVE,
+                      deadline: Optional[float] = None, requests: int = 1) -> None:
+        """Wait for quota; `deadline` is a time.monotonic() value after which the work is dropped"""
+        priority = Priority.parse(priority)
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), requests, tokens, deadline, loop.create_future())
+
+        if not self._queue and self._try_grant(waiter, time.monotonic()):
+            return
+        if len(self._queue) >= self.max_queue:
+            self._drop(waiter, "queue full")
+            raise QueueDropped(f"LLM queue full ({self.max_queue} waiting)")
+
+        self.queued += 1
+        self.queued_by_priority[priority.name.lower()] += 1
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            waiter.future.cancel()
+            raise
+
+    def _try_grant(self, waiter: _Waiter, now: float) -> bool:
+        if now < self._paused_until:
+            return False
+        if self.requests.wait_time(waiter.requests, now) or self.tokens.wait_time(waiter.tokens, now):
+            return False
+        self.requests.take(waiter.requests)
+        self.tokens.take(waiter.tokens)
+        self.granted += 1
+        return True
+
+    def _drop(self, waiter: _Waiter, reason: str) -> None:
+        self.dropped += 1
+        self.dropped_by_priority[waiter.priority.name.lower()] += 1
+        print(f"[DEBUG] Dropped {waiter.priority.name.lower()} LLM call: {reason}", file=sys.stderr)
+
+    def _dispatch(self) -> None:
+        """Grant queued waiters in priority order while quota allows, then re-arm the timer"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        next_wake = None
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if head.deadline is not None and now >= head.deadline:
+                heapq.heappop(self._queue)
+                self._drop(head, "deadline passed while queued")
+                head.future.set_exception(QueueDropped("Deadline passed while waiting for LLM quota"))
+                continue
+            if self._try_grant(head, now):
+                heapq.heappop(self._queue)
+                head.future.set_result(None)
+                continue
+            # Strict priority: nothing behind the head runs until the head does
+            next_wake = max(
+                self._paused_until - now,
+                self.requests.wait_time(head.requests, now),
+                self.tokens.wait_time(head.tokens, now),
+                0.001
+            )
+            earliest_deadline = min((w.deadline for w in self._queue if w.deadline is not None), default=None)
+            if earliest_deadline is not None:
+                next_wake = min(next_wake, max(earliest_deadline - now, 0.001))
+            break
+        if next_wake is not None:
+            self._timer = asyncio.get_running_loop().call_later(next_wake, self._dispatch)
+
+    def pause(self, seconds: float) -> None:
+        """Stop granting quota for `seconds` (provider told us to back off)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: int = 0,
+                   priority: Priority = Priority.INTERACTIVE, deadline: Optional[float] = None,
+                   requests: int = 1) -> Any:
+        """Run an LLM call under the limiter, retrying 429s after the server-suggested delay"""
+        attempt = 0
+        while True:
+            await self.acquire(tokens=tokens, priority=priority, deadline=deadline, requests=requests)
+            try:
+                return await fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.throttled += 1
+                self.retried += 1
+                delay = retry_after_seconds(e) or min(60.0, 2.0 ** attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self.dropped += 1
+                    self.dropped_by_priority[Priority.parse(priority).name.lower()] += 1
+                    raise RateLimitExceeded(f"Rate limited and retry-after {delay:.1f}s exceeds deadline") from e
+                print(f"[DEBUG] LLM rate limited, retrying in {delay:.1f}s (attempt {attempt})", file=sys.stderr)
+                self.pause(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "granted": self.granted,
+            "queued": self.queued,
+            "queued_by_priority": dict(self.queued_by_priority),
+            "dropped": self.dropped,
+            "dropped_by_priority": dict(self.dropped_by_priority),
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "waiting": len(self._queue),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2)
+        }
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Local durable store for processed goal results
+SQLite (WAL) table of every process_goal result, queryable by user and by normalized
+goal hash, with bulk JSONL export/import. Replaces the loose portia_result_*.json files.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator, Iterable, TextIO
+
+from cloud_offload import default_data_dir
+from goal_tools import categorize_goal
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_goal(goal: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", goal.lower())).strip()
+
+
+def normalize_timeframe(timeframe: str) -> str:
+    """Canonical timeframe text, e.g. '3-Months' -> '3 months'"""
+    return _SPACES.sub(" ", timeframe.lower().replace("-", " ").replace("_", " ")).strip()
+
+
+def goal_hash(goal: str) -> str:
+    """Stable key for a goal after normalization"""
+    return hashlib.sha1(normalize_goal(goal).encode("utf-8")).hexdigest()
+
+
+_COLUMNS = ("id", "user_id", "goal", "goal_hash", "category", "timeframe", "provider",
+            "model", "fallback", "duration_ms", "plan_id", "created_at", "payload")
+
+
+class ResultsStore:
+    """SQLite-backed store of process_goal results"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                goal_hash TEXT NOT NULL,
+                category TEXT,
+                timeframe TEXT NOT NULL,
+                provider TEXT,
+                model TEXT,
+                fallback INTEGER NOT NULL DEFAULT 0,
+                duration_ms REAL,
+                plan_id TEXT,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_user ON results (user_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_results_goal ON results (goal_hash, timeframe, created_at);
+        """)
+        self._backfill_categories()
+
+    def _backfill_categories(self) -> None:
+        """Categorize rows stored without a category (e.g. imported before categories were derived)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, goal FROM results WHERE category IS NULL").fetchall()
+            if rows:
+                self._conn.executemany(
+                    "UPDATE results SET category = ? WHERE id = ?",
+                    [(categorize_goal(goal), row_id) for row_id, goal in rows]
+                )
+
+    def record(self, result: Dict[str, Any], goal: str, timeframe: str, user_id: str,
+               category: Optional[str] = None, provider: Optional[str] = None,
+               model: Optional[str] = None, duration_ms: Optional[float] = None,
+               created_at: Optional[float] = None) -> int:
+        """Store one result; returns its row id"""
+        row = (
+            user_id,
+            goal,
+            goal_hash(goal),
+            category or categorize_goal(goal),
+            normalize_timeframe(timeframe),
+            provider,
+            model,
+            1 if result.get("fallback") else 0,
+            duration_ms,
+            result.get("plan_id"),
+            created_at if created_at is not None else time.time(),
+            json.dumps(result, separators=(",", ":"))
+        )
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO results (user_id, goal, goal_hash, category, timeframe, provider, model, "
+                "fallback, duration_ms, plan_id, created_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+        return cursor.lastrowid
+
+    def get(self, result_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM results WHERE id = ?", (result_id,))
+        return rows[0] if rows else None
+
+    def by_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent results for a user"""
+        return self._query(
+            "SELECT * FROM results WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        )
+
+    def by_goal(self, goal: str, timeframe: Optional[str] = None, limit: int = 50,
+                hashed: bool = False) -> List[Dict[str, Any]]:
+        """Most recent results for a normalized goal (pass hashed=True if goal is already a goal_hash)"""
+        key = goal if hashed else goal_hash(goal)
+        if timeframe is None:
+            return self._query(
+                "SELECT * FROM results WHERE goal_hash = ? ORDER BY created_at DESC LIMIT ?", (key, limit)
+            )
+        return self._query(
+            "SELECT * FROM results WHERE goal_hash = ? AND timeframe = ? ORDER BY created_at DESC LIMIT ?",
+            (key, normalize_timeframe(timeframe), limit)
+        )
+
+    def iter_results(self, batch_size: int = 500, since_id: int = 0,
+                     user_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream stored results without loading the table into memory
+
+        All results come in insertion order; with user_id only that user's, in created_at
+        order, paged through the idx_results_user index.
+        """
+        if user_id is not None:
+            yield from self._iter_user_results(user_id, batch_size, since_id)
+            return
+        last_id = since_id
+        while True:
+            rows = self._query(
+                "SELECT * FROM results WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            last_id = rows[-1]["id"]
+
+    def _iter_user_results(self, user_id: str, batch_size: int, since_id: int) -> Iterator[Dict[str, Any]]:
+        # Keyset pagination on (created_at, id) so each page is a range scan of the index
+        last = (float("-inf"), 0)
+        while True:
+            rows = self._query(
+                "SELECT * FROM results WHERE user_id = ? AND (created_at, id) > (?, ?) AND id > ? "
+                "ORDER BY created_at, id LIMIT ?",
+                (user_id, last[0], last[1], since_id, batch_size)
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total, users, goals, fallbacks, avg_ms = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT user_id), COUNT(DISTINCT goal_hash), "
+                "COALESCE(SUM(fallback), 0), AVG(duration_ms) FROM results"
+            ).fetchone()
+            categories = dict(self._conn.execute(
+                "SELECT COALESCE(category, 'unknown'), COUNT(*) FROM results GROUP BY category"
+            ).fetchall())
+        return {
+            "results": total,
+            "users": users,
+            "distinct_goals": goals,
+            "fallback_results": fallbacks,
+            "avg_duration_ms": round(avg_ms, 2) if avg_ms is not None else None,
+            "categories": categories
+        }
+
+    def export_jsonl(self, out: TextIO) -> int:
+        """Write every row as one JSON object per line; returns the row count"""
+        exported = 0
+        for row in self.iter_results():
+            out.write(json.dumps(row, separators=(",", ":")) + "\n")
+            exported += 1
+        return exported
+
+    def import_rows(self, rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+        """Bulk insert exported rows (ids are reassigned); returns the row count"""
+        imported = 0
+        batch = []
+        for row in rows:
+            payload = row.get("result", row.get("payload", {}))
+            batch.append((
+                row.get("user_id") or "default-user",
+                row["goal"],
+                row.get("goal_hash") or goal_hash(row["goal"]),
+                row.get("category") or categorize_goal(row["goal"]),
+                normalize_timeframe(row.get("timeframe", "")),
+                row.get("provider"),
+                row.get("model"),
+                1 if row.get("fallback") else 0,
+                row.get("duration_ms"),
+                row.get("plan_id"),
+                row.get("created_at") or time.time(),
+                payload if isinstance(payload, str) else json.dumps(payload, separators=(",", ":"))
+            ))
+            if len(batch) >= batch_size:
+                imported += self._insert_many(batch)
+                batch = []
+        if batch:
+            imported += self._insert_many(batch)
+        return imported
+
+    def import_jsonl(self, source: TextIO) -> int:
+        return self.import_rows(json.loads(line) for line in source if line.strip())
+
+    def import_legacy_files(self, paths: Iterable[str]) -> int:
+        """Import the old portia_result_<timestamp>.json files"""
+        def rows():
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+                match = re.search(r"(\d{8}_\d{6})", os.path.basename(path))
+                created_at = (
+                    datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+                    if match else os.path.getmtime(path)
+                )
+                yield {
+                    "goal": legacy.get("goal", ""),
+                    "timeframe": legacy.get("timeframe", ""),
+                    "provider": legacy.get("provider"),
+                    "model": legacy.get("model"),
+                    "fallback": legacy.get("provider") == "local-fallback",
+                    "created_at": created_at,
+                    "result": legacy
+                }
+        return self.import_rows(rows())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insert_many(self, batch: List[tuple]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO results (user_id, goal, goal_hash, category, timeframe, provider, model, "
+                    "fallback, duration_ms, plan_id, created_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(batch)
+
+    def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            record = dict(zip(_COLUMNS, row))
+            record["fallback"] = bool(record["fallback"])
+            record["result"] = json.loads(record.pop("payload"))
+            results.append(record)
+        return results
+
+
+def open_results_store(path: Optional[str] = None) -> Optional[ResultsStore]:
+    """Open the configured store, or None when disabled (RESULTS_STORE=off) or unavailable"""
+    if os.getenv("RESULTS_STORE", "on").lower() in ("off", "false", "0"):
+        return None
+    try:
+        return ResultsStore(path or os.getenv("RESULTS_STORE_PATH") or os.path.join(default_data_dir(), "results.db"))
+    except Exception as e:
+        print(f"[DEBUG] Results store unavailable: {e}", file=sys.stderr)
+        return None
+
+
+if __name__ == "__main__":
+    commands = ("export", "import", "import-legacy", "stats")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print("Usage: python results_store.py export [out.jsonl] | import <in.jsonl> | "
+              "import-legacy <portia_result_*.json ...> | stats")
+        sys.exit(1)
+
+    store = ResultsStore(os.getenv("RESULTS_STORE_PATH") or os.path.join(default_data_dir(), "results.db"))
+    command = sys.argv[1]
+    if command == "export":
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "w", encoding="utf-8") as out:
+                count = store.export_jsonl(out)
+        else:
+            count = store.export_jsonl(sys.stdout)
+        print(f"[DEBUG] Exported {count} results", file=sys.stderr)
+    elif command == "import":
+        with open(sys.argv[2], "r", encoding="utf-8") as source:
+            print(f"[DEBUG] Imported {store.import_jsonl(source)} results", file=sys.stderr)
+    elif command == "import-legacy":
+        print(f"[DEBUG] Imported {store.import_legacy_files(sys.argv[2:])} legacy results", file=sys.stderr)
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    store.close()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Streaming schedule export
+Turns plan timelines (milestones and weekly_schedule) into iCalendar events or CSV rows
+one result at a time, so a batch of any size is exported with constant memory.
+
+Usage: python schedule_export.py ics|csv [out_file] [--user USER_ID] [--input results.jsonl|result.json]
+"""
+
+import os
+import sys
+import csv
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Iterable, Iterator, TextIO
+
+from results_store import ResultsStore
+from cloud_offload import default_data_dir
+
+CSV_COLUMNS = ["user_id", "goal", "kind", "title", "start_date", "end_date", "description", "source_id"]
+
+PRODID = "-//Dream Task//Schedule Export//EN"
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _source_id(row: Dict[str, Any]) -> str:
+    result = row.get("result") or {}
+    if row.get("id") is not None:
+        return str(row["id"])
+    for key in ("run_id", "plan_id"):
+        if result.get(key):
+            return str(result[key])
+    raw = f"{row.get('user_id')}\n{row.get('goal')}\n{result.get('processed_at')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def iter_events(row: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Calendar events for one stored row ({"result", "goal", "user_id", "id"}) or bare result"""
+    result = row["result"] if "result" in row else row
+    timeline = result.get("timeline") or {}
+    goal = row.get("goal") or result.get("goal") or ""
+    user_id = row.get("user_id") or result.get("user_id") or ""
+    source_id = _source_id(row if "result" in row else {"result": result, "user_id": user_id, "goal": goal})
+    label = f"{goal}: " if goal else ""
+
+    for week in timeline.get("weekly_schedule") or ():
+        start = _parse_date(week.get("start_date"))
+        if start is None:
+            continue
+        tasks = week.get("tasks") or []
+        yield {
+            "uid": f"{source_id}-week-{week.get('week')}",
+            "kind": "week",
+            "start": start.date(),
+            "end": (start + timedelta(days=7)).date(),
+            "title": f"{label}Week {week.get('week')} ({week.get('focus_area', 'review')})",
+            "description": "; ".join(tasks) if tasks else "Review progress",
+            "goal": goal,
+            "user_id": user_id,
+            "source_id": source_id
+        }
+
+    for number, milestone in enumerate(timeline.get("milestones") or (), 1):
+        start = _parse_date(milestone.get("date"))
+        if start is None:
+            continue
+        yield {
+            "uid": f"{source_id}-milestone-{number}",
+            "kind": "milestone",
+            "start": start.date(),
+            "end": (start + timedelta(days=1)).date(),
+            "title": f"{label}{milestone.get('title', f'Milestone {number}')}",
+            "description": milestone.get("description", ""),
+            "goal": goal,
+            "user_id": user_id,
+            "source_id": source_id
+        }
+
+
+def _ics_text(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """RFC 5545 line folding: at most 75 octets per line, continuations start with a space"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    start, limit = 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ics_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Yield a VCALENDAR document as header, one VEVENT block per event, and footer"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n"
+    for row in rows:
+        for event in iter_events(row):
+            description = _fold(f"DESCRIPTION:{_ics_text(event['description'])}") if event["description"] else ""
+            yield (
+                "BEGIN:VEVENT\r\n"
+                f"UID:{event['uid']}@dream-task\r\n"
+                f"DTSTAMP:{stamp}\r\n"
+                f"DTSTART;VALUE=DATE:{event['start']:%Y%m%d}\r\n"
+                f"DTEND;VALUE=DATE:{event['end']:%Y%m%d}\r\n"
+                + _fold(f"SUMMARY:{_ics_text(event['title'])}")
+                + description
+                + f"CATEGORIES:{event['kind'].upper()}\r\n"
+                "END:VEVENT\r\n"
+            )
+    yield "END:VCALENDAR\r\n"
+
+
+def csv_rows(rows: Iterable[Dict[str, Any]]) -> Iterator[List[str]]:
+    """Yield one CSV row (CSV_COLUMNS order) per event"""
+    for row in rows:
+        for event in iter_events(row):
+            yield [
+                event["user_id"],
+                event["goal"],
+                event["kind"],
+                event["title"],
+                event["start"].isoformat(),
+                event["end"].isoformat(),
+                event["description"],
+                event["source_id"]
+            ]
+
+
+def write_ics(rows: Iterable[Dict[str, Any]], out: TextIO) -> int:
+    """Stream an iCalendar document to out; returns the number of events written"""
+    chunks = 0
+    for chunk in ics_chunks(rows):
+        out.write(chunk)
+        chunks += 1
+    return chunks - 2
+
+
+def write_csv(rows: Iterable[Dict[str, Any]], out: TextIO) -> int:
+    """Stream CSV (with header) to out; returns the number of events written"""
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    events = 0
+    for values in csv_rows(rows):
+        writer.writerow(values)
+        events += 1
+    return events
+
+
+def iter_input_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Rows from a JSONL file (store export or --serve output), or a single agent result .json"""
+    with open(path, "r", encoding="utf-8") as source:
+        if path.endswith(".json"):
+            yield json.load(source)
+            return
+        for line in source:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_store_rows(store: ResultsStore, user_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stored rows in insertion order, or one user's rows via the user index"""
+    return store.iter_results(user_id=user_id)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] not in ("ics", "csv"):
+        print("Usage: python schedule_export.py ics|csv [out_file] [--user USER_ID] [--input results.jsonl|result.json]")
+        sys.exit(1)
+
+    fmt = args.pop(0)
+    options = {}
+    positional = []
+    while args:
+        arg = args.pop(0)
+        if arg in ("--user", "--input") and args:
+            options[arg] = args.pop(0)
+        else:
+            positional.append(arg)
+
+    store = None
+    if "--input" in options:
+        rows = iter_input_file(options["--input"])
+        if "--user" in options:
+            rows = (row for row in rows if (row.get("user_id") or row.get("result", {}).get("user_id")) == options["--user"])
+    else:
+        store = ResultsStore(os.getenv("RESULTS_STORE_PATH") or os.path.join(default_data_dir(), "results.db"))
+        rows = iter_store_rows(store, options.get("--user"))
+
+    write = write_ics if fmt == "ics" else write_csv
+    # csv needs newline="" so the writer controls line endings; ics lines carry their own CRLF
+    if positional:
+        with open(positional[0], "w", encoding="utf-8", newline="") as out:
+            count = write(rows, out)
+    else:
+        sys.stdout.reconfigure(newline="")
+        count = write(rows, sys.stdout)
+    print(f"[DEBUG] Exported {count} events", file=sys.stderr)
+    if store is not None:
+        store.close()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Per-user session state for the Dream-to-Task agent
+Lightweight user state (EndUser, preferences, recent plans) kept in a bounded LRU cache
+so one shared Portia runtime can serve many users
+"""
+
+import sys
+import copy
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Callable
+
+DEFAULT_PREFERENCES = {
+    "working_hours_per_week": 20,
+    "preferred_working_days": ["monday", "tuesday", "wednesday", "thursday", "friday"],
+    "timezone": "UTC"
+}
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate deep memory footprint of plain Python containers in bytes"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), _seen)
+    return size
+
+
+class UserSession:
+    """Lightweight per-user state reused across requests"""
+
+    def __init__(self, user_id: str, preferences: Optional[Dict[str, Any]] = None, max_recent_plans: int = 5):
+        self.user_id = user_id
+        self.preferences = copy.deepcopy(preferences or DEFAULT_PREFERENCES)
+        self.end_user = None
+        self.recent_plans = deque(maxlen=max_recent_plans)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.request_count = 0
+        self.size_bytes = 0
+
+    def build_user_context(self) -> Dict[str, Any]:
+        """Default user context passed to the planner when the caller provides none"""
+        return {
+            "user_id": self.user_id,
+            "preferences": self.preferences
+        }
+
+    def record_plan(self, goal: str, timeframe: str, result: Dict[str, Any]) -> None:
+        """Keep a compact summary of a processed goal (not the full result)"""
+        self.recent_plans.append({
+            "goal": goal,
+            "timeframe": timeframe,
+            "plan_id": result.get("plan_id"),
+            "fallback": bool(result.get("fallback", False)),
+            "task_count": len(result.get("tasks") or []),
+            "processed_at": result.get("processed_at")
+        })
+
+    def measure(self) -> int:
+        """Recompute the approximate memory footprint of this session"""
+        # EndUser is an SDK object, so count it shallowly
+        self.size_bytes = (
+            estimate_size(self.user_id)
+            + estimate_size(self.preferences)
+            + estimate_size(self.recent_plans)
+            + (sys.getsizeof(self.end_user) if self.end_user is not None else 0)
+        )
+        return self.size_bytes
+
+
+class SessionCache:
+    """Bounded LRU cache of UserSession objects with memory accounting"""
+
+    def __init__(self, max_sessions: int = 1000, max_bytes: Optional[int] = None,
+                 session_factory: Optional[Callable[[str], UserSession]] = None):
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1")
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._session_factory = session_factory or UserSession
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._sessions
+
+    def get(self, user_id: str) -> UserSession:
+        """Return the session for user_id, creating it (and evicting LRU entries) if needed"""
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self.hits += 1
+            self._sessions.move_to_end(user_id)
+        else:
+            self.misses += 1
+            session = self._session_factory(user_id)
+            self._sessions[user_id] = session
+            self._total_bytes += session.measure()
+            self._evict()
+
+        session.last_used = time.time()
+        session.request_count += 1
+        return session
+
+    def update(self, session: UserSession) -> None:
+        """Re-account a session after its contents changed"""
+        if self._sessions.get(session.user_id) is not session:
+            return
+        previous = session.size_bytes
+        self._total_bytes += session.measure() - previous
+        self._evict()
+
+    def discard(self, user_id: str) -> bool:
+        """Drop a session explicitly (e.g. on logout)"""
+        session = self._sessions.pop(user_id, None)
+        if session is None:
+            return False
+        self._total_bytes -= session.size_bytes
+        return True
+
+    def _evict(self) -> None:
+        # Always keep the most recently used session, even if it alone exceeds max_bytes
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            user_id, session = self._sessions.popitem(last=False)
+            self._total_bytes -= session.size_bytes
+            self.evictions += 1
+            self.evicted_bytes += session.size_bytes
+            print(f"[DEBUG] Evicted session for user: {user_id}", file=sys.stderr)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache occupancy, memory usage and eviction metrics"""
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes
+        }
+
+    def user_ids(self) -> List[str]:
+        """User ids from least to most recently used"""
+        return list(self._sessions.keys())
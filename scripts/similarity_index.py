@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Goal similarity index for nearest-neighbor plan reuse
+Hashed n-gram goal vectors with a random-hyperplane LSH index (NumPy), so near-duplicate
+goals can reuse a prior plan instead of a full LLM planning call
+"""
+
+import os
+import sys
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+from results_store import ResultsStore, normalize_goal
+from cloud_offload import default_data_dir
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("[DEBUG] NumPy not available, goal similarity index disabled", file=sys.stderr)
+
+# Words that don't change what a goal is about (timeframes are matched separately)
+STOPWORDS = frozenset("""
+a an the to of in on for and or my i me be get into with by at from how want would like
+within over next this that about day days week weeks month months year years
+""".split())
+
+
+# Bump when features change so snapshots built with the old vectorizer are rebuilt
+FEATURES_VERSION = 2
+
+
+_TIME_UNITS = frozenset("day days week weeks month months year years".split())
+_FREQUENCY_WORDS = frozenset(("a", "an", "per", "each", "every"))
+
+
+def numeric_tokens(goal: str) -> Tuple[str, ...]:
+    """Numbers in a goal ("lose 5 kg" vs "lose 50 kg" are different goals)
+
+    Durations ("in 6 months") are left out: the timeframe is matched separately.
+    Frequencies ("3 days a week") are kept.
+    """
+    words = normalize_goal(goal).split() + ["", ""]
+    return tuple(sorted(
+        word for i, word in enumerate(words[:-2])
+        if word.isdigit() and (words[i + 1] not in _TIME_UNITS or words[i + 2] in _FREQUENCY_WORDS)
+    ))
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class GoalVectorizer:
+    """Signed feature hashing of word unigrams and character trigrams, L2-normalized"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def features(self, goal: str) -> List[str]:
+        words = [w for w in normalize_goal(goal).split() if w not in STOPWORDS]
+        features = ["w:" + w for w in words]
+        for word in words:
+            if word.isdigit():
+                # Whole numbers only: trigrams would make 5 and 50 look alike
+                continue
+            padded = f" {word} "
+            features.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def transform(self, goal: str) -> "np.ndarray":
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(goal):
+            h = _feature_hash(feature)
+            weight = 2.0 if feature.startswith("w:") else 1.0
+            vector[h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class GoalSimilarityIndex:
+    """Approximate nearest-neighbor index over goal vectors
+
+    Each of `tables` LSH tables hashes a vector to `bits` hyperplane signs. Tables are
+    kept as sorted key arrays so a probe is a binary search; recent inserts sit in a
+    small unsorted tail that is scanned directly and merged in once it grows. Vectors are
+    stored as int8 with a per-vector scale. At dim=256 and 16 tables a goal costs ~460
+    bytes: 260 for the vector, 8 for its id and 64 each for its keys, sorted keys and
+    sorted row numbers. Snapshots keep the sorted arrays so loading doesn't re-sort.
+    """
+
+    def __init__(self, dim: int = 256, tables: int = 16, bits: int = 16, seed: int = 7,
+                 merge_threshold: int = 4096):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for the goal similarity index")
+        self.vectorizer = GoalVectorizer(dim)
+        self.dim = dim
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        self.merge_threshold = merge_threshold
+        self._planes = np.random.default_rng(seed).standard_normal((tables, bits, dim)).astype(np.float32)
+        self._weights = (1 << np.arange(bits, dtype=np.uint32)).astype(np.uint32)
+        # Each probe also checks the buckets one flipped bit away
+        self._probe_masks = np.concatenate([[0], self._weights]).astype(np.uint32)
+        self._capacity = 0
+        self._size = 0
+        self._vectors = np.zeros((0, dim), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._keys = np.zeros((0, tables), dtype=np.uint32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        # (tables, indexed) arrays: bucket keys in order, and the row each one belongs to
+        self._sorted_keys = np.zeros((tables, 0), dtype=np.uint32)
+        self._sorted_rows = np.zeros((tables, 0), dtype=np.int32)
+        self._indexed = 0
+        self.last_result_id = 0
+        # Results store rows seen since the last snapshot (replayed by catch_up on load)
+        self.unsaved_rows = 0
+        self.path: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _hash(self, vectors: "np.ndarray") -> "np.ndarray":
+        # (n, dim) x (tables, bits, dim) -> (n, tables) bucket keys
+        signs = np.einsum("nd,tbd->ntb", vectors.astype(np.float32), self._planes) > 0
+        return (signs.astype(np.uint32) * self._weights).sum(axis=2, dtype=np.uint32)
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.int8)
+        scales = np.zeros(capacity, dtype=np.float32)
+        keys = np.zeros((capacity, self.tables), dtype=np.uint32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        vectors[:self._size] = self._vectors[:self._size]
+        scales[:self._size] = self._scales[:self._size]
+        keys[:self._size] = self._keys[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._scales, self._keys, self._ids = vectors, scales, keys, ids
+        self._capacity = capacity
+
+    def add(self, result_id: int, goal: str) -> None:
+        """Insert one goal, keyed by its results store row id"""
+        self.add_many([(result_id, goal)])
+
+    def add_many(self, items: List[Tuple[int, str]]) -> None:
+        if not items:
+            return
+        vectors = np.stack([self.vectorizer.transform(goal) for _result_id, goal in items])
+        start, end = self._size, self._size + len(items)
+        self._grow(end)
+        peaks = np.abs(vectors).max(axis=1)
+        peaks[peaks == 0] = 1.0
+        self._vectors[start:end] = np.rint(vectors / peaks[:, None] * 127).astype(np.int8)
+        self._scales[start:end] = peaks / 127
+        self._keys[start:end] = self._hash(vectors)
+        self._ids[start:end] = [result_id for result_id, _goal in items]
+        self._size = end
+        self.last_result_id = max(self.last_result_id, max(result_id for result_id, _goal in items))
+        if self._size - self._indexed >= self.merge_threshold:
+            self._merge()
+
+    def observe(self, result_id: int, goal: str, result: Dict[str, Any]) -> None:
+        """Account for a newly stored result, indexing it if it is reusable"""
+        if is_reusable(result):
+            self.add(result_id, goal)
+        self.last_result_id = max(self.last_result_id, result_id)
+        self.unsaved_rows += 1
+
+    def _merge(self) -> None:
+        """Fold the unsorted tail into the sorted per-table key arrays
+
+        Only the tail is sorted; it is spliced into the existing arrays in one linear
+        pass per table, so a merge costs a copy of the index, not a re-sort of it.
+        """
+        start, end = self._indexed, self._size
+        if start == end:
+            return
+        tail = self._keys[start:end]
+        sorted_keys = np.empty((self.tables, end), dtype=np.uint32)
+        sorted_rows = np.empty((self.tables, end), dtype=np.int32)
+        for t in range(self.tables):
+            order = np.argsort(tail[:, t], kind="stable")
+            keys = tail[order, t]
+            # side="right" keeps equal keys in row order, like a stable sort of everything
+            at = np.searchsorted(self._sorted_keys[t], keys, side="right")
+            sorted_keys[t] = np.insert(self._sorted_keys[t], at, keys)
+            sorted_rows[t] = np.insert(self._sorted_rows[t], at, (order + start).astype(np.int32))
+        self._sorted_keys, self._sorted_rows = sorted_keys, sorted_rows
+        self._indexed = end
+
+    def query(self, goal: str, k: int = 5, min_similarity: float = 0.0) -> List[Tuple[int, float]]:
+        """Return up to k (result_id, cosine similarity) pairs, best first"""
+        if not self._size:
+            return []
+        vector = self.vectorizer.transform(goal)
+        candidates = []
+        if self._indexed:
+            query_keys = self._hash(vector[None, :])[0]
+            for t in range(self.tables):
+                probes = query_keys[t] ^ self._probe_masks
+                lo = np.searchsorted(self._sorted_keys[t], probes, side="left")
+                hi = np.searchsorted(self._sorted_keys[t], probes, side="right")
+                for start, end in zip(lo, hi):
+                    if end > start:
+                        candidates.append(self._sorted_rows[t][start:end])
+        if self._indexed < self._size:
+            candidates.append(np.arange(self._indexed, self._size, dtype=np.int64))
+        if not candidates:
+            return []
+
+        rows = np.unique(np.concatenate(candidates))
+        # Quantization can push exact matches slightly past 1.0
+        scores = np.minimum((self._vectors[rows].astype(np.float32) @ vector) * self._scales[rows], 1.0)
+        order = np.argsort(-scores)[:k]
+        return [
+            (int(self._ids[rows[i]]), float(scores[i]))
+            for i in order if scores[i] >= min_similarity
+        ]
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        self._merge()
+        np.savez(
+            tmp_path,
+            vectors=self._vectors[:self._size],
+            scales=self._scales[:self._size],
+            keys=self._keys[:self._size],
+            ids=self._ids[:self._size],
+            sorted_keys=self._sorted_keys,
+            sorted_rows=self._sorted_rows,
+            meta=np.array([self.dim, self.tables, self.bits, self.seed, self.last_result_id, FEATURES_VERSION],
+                          dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+        self.unsaved_rows = 0
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "GoalSimilarityIndex":
+        with np.load(path) as data:
+            meta = [int(v) for v in data["meta"]]
+            if len(meta) != 6 or meta[5] != FEATURES_VERSION:
+                raise ValueError("goal index snapshot was built with an older vectorizer")
+            dim, tables, bits, seed, last_result_id = meta[:5]
+            index = cls(dim=dim, tables=tables, bits=bits, seed=seed, **kwargs)
+            # Take the loaded arrays as they are; the first insert grows them
+            index._vectors = data["vectors"]
+            index._scales = data["scales"]
+            index._keys = data["keys"]
+            index._ids = data["ids"]
+            index._size = index._capacity = len(index._ids)
+            sorted_rows = data["sorted_rows"] if "sorted_rows" in data.files else None
+            if sorted_rows is not None and sorted_rows.shape == (tables, index._size):
+                index._sorted_keys = data["sorted_keys"]
+                index._sorted_rows = sorted_rows
+                index._indexed = index._size
+        index.last_result_id = last_result_id
+        # Snapshots from before the sorted arrays were saved are sorted once here
+        index._merge()
+        return index
+
+    def catch_up(self, store: ResultsStore, batch_size: int = 1000) -> int:
+        """Index results stored since the last snapshot; returns how many were added"""
+        added = 0
+        batch = []
+        for row in store.iter_results(since_id=self.last_result_id):
+            self.last_result_id = max(self.last_result_id, row["id"])
+            self.unsaved_rows += 1
+            if is_reusable(row["result"]):
+                batch.append((row["id"], row["goal"]))
+            if len(batch) >= batch_size:
+                self.add_many(batch)
+                added += len(batch)
+                batch = []
+        self.add_many(batch)
+        added += len(batch)
+        return added
+
+
+def is_reusable(result: Dict[str, Any]) -> bool:
+    """Only LLM-planned results are worth reusing (not fallbacks, routed-local, reused or coalesced copies)"""
+    return (bool(result.get("success")) and not result.get("fallback") and not result.get("routed_local")
+            and "reused_from" not in result and not result.get("coalesced"))
+
+
+def open_goal_index(store: Optional[ResultsStore], path: Optional[str] = None) -> Optional[GoalSimilarityIndex]:
+    """Load the index snapshot and catch up from the results store, or None when disabled"""
+    if store is None or not NUMPY_AVAILABLE:
+        return None
+    if os.getenv("GOAL_SIMILARITY", "on").lower() in ("off", "false", "0"):
+        return None
+    path = path or os.path.join(default_data_dir(), "goal_index.npz")
+    try:
+        index = None
+        if os.path.exists(path):
+            try:
+                index = GoalSimilarityIndex.load(path)
+            except ValueError as e:
+                print(f"[DEBUG] Rebuilding goal index from the results store: {e}", file=sys.stderr)
+        index = index or GoalSimilarityIndex()
+        index.path = path
+        added = index.catch_up(store)
+        print(f"[DEBUG] Goal index ready: {len(index)} goals ({added} new)", file=sys.stderr)
+        return index
+    except Exception as e:
+        print(f"[DEBUG] Goal similarity index unavailable: {e}", file=sys.stderr)
+        return None
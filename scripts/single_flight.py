@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one execution: in-process followers await the
+leader's future, and other worker processes rendezvous through a per-key file lock and a
+result file written by the leader.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+FCNTL_AVAILABLE = False
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # No flock on Windows: coalescing stays in-process only
+    pass
+
+from prompt_builder import compact_context, encode_context
+from results_store import normalize_goal, normalize_timeframe
+
+
+def flight_key(goal: str, timeframe: str, user_context: Optional[Dict[str, Any]] = None) -> str:
+    """Key for requests that would produce the same plan (user id excluded)"""
+    raw = "\n".join([normalize_goal(goal), normalize_timeframe(timeframe), encode_context(compact_context(user_context))])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _LeaderCancelled(Exception):
+    """Set on a flight's future when its leader is cancelled, so followers retry"""
+
+
+class SingleFlight:
+    """Collapses concurrent identical work into one call
+
+    Calls carry a priority (lower is more urgent, as rate_limiter.Priority); a call never
+    follows a less urgent leader, since that leader may sit in a slower queue.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None, wait_timeout: float = 120.0,
+                 poll_interval: float = 0.05, cleanup_after: float = 600.0):
+        self.lock_dir = lock_dir if FCNTL_AVAILABLE else None
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.cleanup_after = cleanup_after
+        # key -> (leader's future, leader's priority)
+        self._inflight: Dict[str, Tuple["asyncio.Future", int]] = {}
+        self._last_cleanup = 0.0
+        self.leaders = 0
+        self.local_followers = 0
+        self.remote_followers = 0
+        self.overtaken = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], priority: int = 0,
+                 max_wait: Optional[float] = None) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key; returns (result, shared) where shared means another call produced it
+
+        max_wait caps how long this call waits on another process's leader before running fn itself.
+        """
+        overtaken = None
+        while True:
+            entry = self._inflight.get(key)
+            if entry is None:
+                break
+            future, leader_priority = entry
+            if priority < leader_priority:
+                # More urgent than the leader: run it ourselves and lead later arrivals
+                overtaken = entry
+                break
+            try:
+                result = await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The leader was cancelled (e.g. preempted speculative work): take over with our own fn
+                continue
+            self.local_followers += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, priority)
+        self._inflight[key] = entry
+        try:
+            if overtaken is not None:
+                # The lock file is held by the leader we are overtaking, so skip cross-process coalescing
+                self.overtaken += 1
+                self.leaders += 1
+                result, shared = await fn(), False
+            else:
+                result, shared = await self._do_across_processes(key, fn, max_wait)
+            future.set_result(result)
+            return result, shared
+        except asyncio.CancelledError:
+            # Followers didn't ask to be cancelled: wake them so one of them runs it instead
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody awaits doesn't get logged
+            future.exception()
+            raise
+        finally:
+            # An overtaking call may have replaced our entry; hand the key back to one we overtook
+            if self._inflight.get(key) is entry:
+                if overtaken is not None and not overtaken[0].done():
+                    self._inflight[key] = overtaken
+                else:
+                    del self._inflight[key]
+
+    async def _do_across_processes(self, key: str, fn: Callable[[], Awaitable[Any]],
+                                   max_wait: Optional[float] = None) -> Tuple[Any, bool]:
+        if not self.lock_dir:
+            self.leaders += 1
+            return await fn(), False
+
+        arrived = time.time()
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        result_path = os.path.join(self.lock_dir, f"{key}.json")
+        wait_timeout = self.wait_timeout if max_wait is None else min(self.wait_timeout, max_wait)
+        fd, acquired = await self._open_locked(lock_path, wait_timeout)
+        try:
+            # Another process held the lock: its result is ours if it was in flight when we arrived
+            shared = self._read_shared(result_path, arrived)
+            if shared is not None:
+                self.remote_followers += 1
+                return shared, True
+            if not acquired:
+                print(f"[DEBUG] Timed out waiting for in-flight request {key[:12]}, running it here", file=sys.stderr)
+
+            self.leaders += 1
+            started = time.time()
+            result = await fn()
+            self._write_shared(result_path, started, result)
+            return result, False
+        finally:
+            if acquired:
+                # Remove the lock file while still holding it; waiters on this inode notice and reopen
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def _open_locked(self, lock_path: str, wait_timeout: float) -> Tuple[int, bool]:
+        """Open and flock the key's lock file; returns (fd, acquired) where acquired is False on timeout"""
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not await self._acquire(fd, deadline):
+                return fd, False
+            try:
+                current = os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return fd, True
+            # The previous holder removed the file we locked: lock the current one instead
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def _acquire(self, fd: int, deadline: float) -> bool:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(self.poll_interval)
+
+    def _read_shared(self, result_path: str, arrived: float) -> Optional[Any]:
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("started_at", arrived + 1) <= arrived <= record.get("finished_at", 0):
+            return record.get("result")
+        return None
+
+    def _write_shared(self, result_path: str, started: float, result: Any) -> None:
+        tmp_path = f"{result_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"started_at": started, "finished_at": time.time(), "result": result}, f)
+            os.replace(tmp_path, result_path)
+        except Exception as e:
+            print(f"[DEBUG] Failed to publish single-flight result: {e}", file=sys.stderr)
+        self._cleanup()
+
+    def _cleanup(self) -> None:
+        """Remove rendezvous files nobody can still be waiting on"""
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        try:
+            for name in os.listdir(self.lock_dir):
+                path = os.path.join(self.lock_dir, name)
+                if now - os.path.getmtime(path) <= self.cleanup_after:
+                    continue
+                if name.endswith(".json"):
+                    os.remove(path)
+                elif name.endswith(".lock"):
+                    self._remove_stale_lock(path)
+        except OSError:
+            pass
+
+    def _remove_stale_lock(self, path: str) -> None:
+        """Delete a leftover lock file, but only while holding its flock (skipped if someone holds it)"""
+        fd = os.open(path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                os.remove(path)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "local_followers": self.local_followers,
+            "remote_followers": self.remote_followers,
+            "overtaken": self.overtaken
+        }
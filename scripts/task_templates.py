@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Task template registry
+Task knowledge per goal category, loaded once from task_templates.json into immutable
+records and instantiated per request. Shared by the generate_task_breakdown tool and
+the rule-based fallback.
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import time
+import threading
+from typing import Dict, List, Any, Optional, NamedTuple, Tuple
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_templates.json")
+
+
+class FrozenTask(dict):
+    """Read-only task dict shared across requests; copy it (dict(task)) before changing it"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenTask is shared between requests; copy it with dict(task) before modifying")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class TaskTemplate(NamedTuple):
+    """One immutable task record; only description and hours vary per request"""
+    title: str
+    description: str
+    priority: str
+    category: str
+    estimated_hours: int
+    hours_per_week: int
+    dependencies: Tuple[str, ...]
+    tags: Tuple[str, ...]
+    templated: bool
+
+    def instantiate(self, goal: str, duration_weeks: int) -> Dict[str, Any]:
+        """A new dict only when description or hours vary; otherwise the shared FrozenTask"""
+        if not self.templated and not self.hours_per_week:
+            return self.frozen()
+        # Strings and tuples are shared with the template, not copied
+        return {
+            "title": self.title,
+            "description": self.description.format(goal=goal) if self.templated else self.description,
+            "priority": self.priority,
+            "estimated_hours": self.hours_per_week * duration_weeks if self.hours_per_week else self.estimated_hours,
+            "category": self.category,
+            "dependencies": self.dependencies,
+            "tags": self.tags
+        }
+
+    def frozen(self) -> FrozenTask:
+        return _FROZEN[self]
+
+
+class _FrozenCache(dict):
+    # One FrozenTask per fixed template, built on first use
+    def __missing__(self, template: TaskTemplate) -> FrozenTask:
+        task = FrozenTask(
+            title=template.title,
+            description=template.description,
+            priority=template.priority,
+            estimated_hours=template.estimated_hours,
+            category=template.category,
+            dependencies=template.dependencies,
+            tags=template.tags
+        )
+        dict.__setitem__(self, template, task)
+        return task
+
+
+_FROZEN = _FrozenCache()
+
+
+def _load_template(raw: Dict[str, Any]) -> TaskTemplate:
+    return TaskTemplate(
+        title=sys.intern(raw["title"]),
+        description=raw["description"],
+        priority=sys.intern(raw["priority"]),
+        category=sys.intern(raw["category"]),
+        estimated_hours=int(raw.get("estimated_hours", 0)),
+        hours_per_week=int(raw.get("hours_per_week", 0)),
+        dependencies=tuple(sys.intern(d) for d in raw.get("dependencies", ())),
+        tags=tuple(sys.intern(t) for t in raw.get("tags", ())),
+        templated="{goal}" in raw["description"]
+    )
+
+
+def keyword_pattern(keywords: List[str]) -> "re.Pattern":
+    """Pattern for matching goal text against category keywords
+
+    Plain substring matching, as the original per-category checks did ("art" also
+    matches "start"). categorize_goal uses the same rule, so a goal's stored category
+    and its templates come from the same kind of match.
+    """
+    return re.compile("|".join(re.escape(k.lower()) for k in keywords))
+
+
+class TaskTemplateRegistry:
+    """Category-indexed task templates with optional hot reload"""
+
+    def __init__(self, path: str = TEMPLATES_PATH, reload_interval: Optional[float] = None):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = 0.0
+        self._checked_at = 0.0
+        self.reloads = 0
+        self._load()
+
+    def _load(self) -> None:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        first = tuple(_load_template(t) for t in raw.get("always_first", ()))
+        last = tuple(_load_template(t) for t in raw.get("always_last", ()))
+        # (name, pattern, fallback pattern, tasks); fallback_keywords only widen the rule-based fallback
+        categories = tuple(
+            (name, keyword_pattern(entry["keywords"]),
+             keyword_pattern(entry["keywords"] + entry.get("fallback_keywords", [])),
+             tuple(_load_template(t) for t in entry["tasks"]))
+            for name, entry in raw["categories"].items()
+        )
+        by_category = {name: tasks for name, _pattern, _fallback, tasks in categories}
+        # Swap in one assignment so concurrent readers see either the old or the new set
+        self._data = (first, categories, last, by_category)
+        self._mtime = mtime
+        self.version = raw.get("version")
+
+    def reload_if_changed(self) -> bool:
+        """Reload when the template file changed on disk (checked at most every reload_interval)"""
+        now = time.monotonic()
+        if self.reload_interval is None or now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        try:
+            if os.path.getmtime(self.path) == self._mtime:
+                return False
+            with self._lock:
+                self._load()
+            self.reloads += 1
+            print(f"[DEBUG] Reloaded task templates from {self.path}", file=sys.stderr)
+            return True
+        except Exception as e:
+            print(f"[DEBUG] Failed to reload task templates, keeping previous set: {e}", file=sys.stderr)
+            return False
+
+    def categories(self) -> List[str]:
+        return [name for name, _pattern, _fallback, _tasks in self._data[1]]
+
+    def templates_for(self, category: str) -> Tuple[TaskTemplate, ...]:
+        return self._data[3].get(category, ())
+
+    def match(self, goal: str, match_all: bool = False, fallback: bool = False) -> List[str]:
+        """Categories whose keywords appear in the goal (first match only unless match_all)
+
+        fallback=True also counts each category's fallback_keywords.
+        """
+        goal_lower = goal.lower()
+        matched = []
+        for name, pattern, fallback_pattern, _tasks in self._data[1]:
+            if (fallback_pattern if fallback else pattern).search(goal_lower):
+                matched.append(name)
+                if not match_all:
+                    break
+        return matched
+
+    def build_tasks(self, goal: str, duration_weeks: int = 4, match_all: bool = False,
+                    fallback: bool = False) -> List[Dict[str, Any]]:
+        """Instantiate the task list for a goal: common first tasks, category tasks, common last tasks"""
+        self.reload_if_changed()
+        first, _categories, last, by_category = self._data
+        tasks = [t.instantiate(goal, duration_weeks) for t in first]
+        for category in self.match(goal, match_all=match_all, fallback=fallback):
+            tasks.extend(t.instantiate(goal, duration_weeks) for t in by_category.get(category, ()))
+        tasks.extend(t.instantiate(goal, duration_weeks) for t in last)
+        return tasks
+
+
+_REGISTRY: Optional[TaskTemplateRegistry] = None
+
+
+def get_registry() -> TaskTemplateRegistry:
+    """Process-wide registry; TASK_TEMPLATES_RELOAD_SECONDS enables hot reload in long-running mode"""
+    global _REGISTRY
+    if _REGISTRY is None:
+        interval = os.getenv("TASK_TEMPLATES_RELOAD_SECONDS")
+        _REGISTRY = TaskTemplateRegistry(
+            path=os.getenv("TASK_TEMPLATES_PATH", TEMPLATES_PATH),
+            reload_interval=float(interval) if interval else None
+        )
+    return _REGISTRY
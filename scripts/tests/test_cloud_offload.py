@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the local offload queues and the background cloud shipper
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cloud_offload import CloudShipper, OffloadQueue, MemoryOffloadQueue, SQLiteOffloadQueue
+
+
+class SQLiteOffloadQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.data_dir.name, "offload.db")
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_oldest_records_are_dropped_to_stay_within_bounds(self):
+        queue = SQLiteOffloadQueue(self.path, max_bytes=25)
+        for i in range(5):
+            self.assertTrue(queue.put("plan", str(i), "x" * 10))
+        self.assertFalse(queue.put("plan", "big", "x" * 26))
+        self.assertEqual([payload for _seq, _kind, payload in queue.claim_batch(10)], ["x" * 10] * 2)
+        self.assertEqual(queue.stats()["dropped"], 4)
+        self.assertEqual(queue.stats()["bytes"], 20)
+        queue.close()
+
+    def test_claimed_records_are_leased(self):
+        queue = SQLiteOffloadQueue(self.path, lease_seconds=0.2)
+        queue.put("plan", "a", "{}")
+        queue.put("plan_run", "b", "{}")
+        self.assertEqual(len(queue.claim_batch(1)), 1)
+        # Another shipper (e.g. the next process) only sees unleased records
+        other = SQLiteOffloadQueue(self.path, lease_seconds=0.2)
+        self.assertEqual([kind for _seq, kind, _payload in other.claim_batch(10)], ["plan_run"])
+        self.assertEqual(other.claim_batch(10), [])
+        time.sleep(0.25)
+        self.assertEqual(len(other.claim_batch(10)), 2)
+        queue.close()
+        other.close()
+
+    def test_released_records_wait_for_retry_and_run_out_of_attempts(self):
+        queue = SQLiteOffloadQueue(self.path)
+        queue.put("plan", "a", "{}")
+        seqs = [seq for seq, _kind, _payload in queue.claim_batch(10)]
+        self.assertEqual(queue.release(seqs, max_attempts=2, retry_after=0.2), 0)
+        self.assertEqual(queue.claim_batch(10), [])
+        time.sleep(0.25)
+        self.assertEqual(queue.claim_batch(10)[0][0], seqs[0])
+        self.assertEqual(queue.release(seqs, max_attempts=2), 1)
+        self.assertEqual(queue.stats()["pending"], 0)
+        queue.close()
+
+    def test_ack_deletes(self):
+        queue = SQLiteOffloadQueue(self.path)
+        queue.put("plan", "a", "{}")
+        queue.ack([seq for seq, _kind, _payload in queue.claim_batch(10)])
+        self.assertEqual(queue.stats()["pending"], 0)
+        queue.close()
+
+
+class MemoryOffloadQueueTest(unittest.TestCase):
+
+    def test_incomplete_queue_fails_at_construction(self):
+        class PutOnly(OffloadQueue):
+            def put(self, kind, record_id, payload):
+                return True
+
+        with self.assertRaises(TypeError):
+            PutOnly()
+
+    def test_release_waits_for_retry(self):
+        queue = MemoryOffloadQueue()
+        queue.put("plan", "a", "{}")
+        seqs = [seq for seq, _kind, _payload in queue.claim_batch(10)]
+        queue.release(seqs, max_attempts=8, retry_after=60)
+        self.assertEqual(queue.claim_batch(10), [])
+        self.assertEqual(queue.stats()["pending"], 1)
+
+
+class CloudShipperTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_new_records_do_not_cut_backoff_short(self):
+        attempts = []
+
+        def failing_sender(records):
+            attempts.append(len(records))
+            raise ConnectionError("cloud unavailable")
+
+        queue = MemoryOffloadQueue()
+        shipper = CloudShipper(queue, failing_sender, poll_interval=0.2, max_attempts=8)
+        shipper.ensure_started()
+        for i in range(20):
+            shipper.enqueue("plan", str(i), "{}")
+            await asyncio.sleep(0.025)
+        await shipper.stop()
+
+        # First attempt plus at most one retry after the 0.4 s backoff
+        self.assertLessEqual(len(attempts), 2)
+        self.assertEqual(queue.stats()["dropped"], 0)
+        self.assertEqual(queue.stats()["pending"], 20)
+
+    async def test_stopping_mid_batch_returns_it_to_the_queue(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        queue = SQLiteOffloadQueue(os.path.join(data_dir.name, "offload.db"))
+        self.addCleanup(queue.close)
+        sending = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def slow_sender(records):
+            loop.call_soon_threadsafe(sending.set)
+            time.sleep(0.2)
+
+        shipper = CloudShipper(queue, slow_sender)
+        shipper.enqueue("plan", "a", "{}")
+        shipper.ensure_started()
+        await sending.wait()
+        await shipper.stop()
+        self.assertEqual(len(queue.claim_batch(10)), 1)
+
+    async def test_ships_in_batches(self):
+        shipped = []
+        queue = MemoryOffloadQueue()
+        shipper = CloudShipper(queue, shipped.append, batch_size=2)
+        for i in range(5):
+            shipper.enqueue("plan", str(i), "{}")
+        await shipper.stop(flush_timeout=5)
+        self.assertEqual([len(batch) for batch in shipped], [2, 2, 1])
+        self.assertEqual(shipper.stats()["shipped"], 5)
+        self.assertEqual(queue.stats()["pending"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
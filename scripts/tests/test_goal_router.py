@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive goal routing in the agent
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import types
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_store import ResultsStore
+from similarity_index import is_reusable
+
+
+class _FakePortia:
+
+    def __init__(self):
+        self.plans = 0
+
+    async def generate_plan(self, prompt):
+        self.plans += 1
+        return types.SimpleNamespace(id="plan", model_dump_json=lambda: "{}")
+
+    async def run_plan(self, plan, end_user=None):
+        return types.SimpleNamespace(id="run", model_dump_json=lambda: "{}")
+
+
+class AgentRoutingTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {
+            "DREAM_TASK_DATA_DIR": data_dir.name,
+            "GOAL_SIMILARITY": "off",
+            "GUIDANCE_BATCHING": "off",
+            "SINGLE_FLIGHT": "off"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("GOAL_ROUTING", None)
+        self.store = ResultsStore(os.path.join(data_dir.name, "results.db"))
+        self.addCleanup(self.store.close)
+
+    def _agent(self):
+        import portia_agent
+
+        runtime = portia_agent.AgentRuntime(enable_cloud_logging=False)
+        runtime.portia = _FakePortia()
+        runtime.config = types.SimpleNamespace(llm_provider="google", default_model="test-model")
+        runtime.portia_for_model = lambda model: runtime.portia
+        available = portia_agent.PORTIA_AVAILABLE
+        portia_agent.PORTIA_AVAILABLE = True
+        self.addCleanup(setattr, portia_agent, "PORTIA_AVAILABLE", available)
+        return portia_agent.DreamTaskAgent(runtime=runtime, enable_cloud_logging=False,
+                                           results_store=self.store, goal_index=None)
+
+    async def test_shadow_is_the_default(self):
+        with mock.patch.dict(os.environ, {"GOAL_ROUTE_LOCAL_BELOW": "1.0"}):
+            agent = self._agent()
+        self.assertTrue(agent.router.shadow)
+
+        result = await agent.process_goal("Read more", "1 month", user_id="alice")
+        self.assertEqual(agent.runtime.portia.plans, 1)
+        self.assertEqual((result["routing"]["route"], result["routing"]["shadow"]), ("local", True))
+        self.assertFalse(result.get("routed_local"))
+        await agent.shutdown()
+
+    async def test_routed_local_result_is_not_a_fallback(self):
+        with mock.patch.dict(os.environ, {"GOAL_ROUTING": "on", "GOAL_ROUTE_LOCAL_BELOW": "1.0"}):
+            agent = self._agent()
+
+        result = await agent.process_goal("Read more", "1 month", user_id="alice")
+        self.assertEqual(agent.runtime.portia.plans, 0)
+        self.assertTrue(result["routed_local"])
+        self.assertFalse(result["fallback"])
+        self.assertFalse(is_reusable(result))
+        row = self.store.by_user("alice")[0]
+        self.assertEqual((row["provider"], row["fallback"]), ("local-routed", False))
+        await agent.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
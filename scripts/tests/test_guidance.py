@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for batched guidance deadlines and cleanup
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import types
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from micro_batcher import GeminiGuidance, MicroBatcher
+from rate_limiter import QuotaRateLimiter, RateLimitExceeded
+
+
+class GuidanceDeadlineTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_queued_batch_is_dropped_after_timeout(self):
+        limiter = QuotaRateLimiter(requests_per_minute=1, tokens_per_minute=1000000)
+        await limiter.acquire(1)
+        calls = []
+
+        async def generate_content_async(prompt, generation_config=None):
+            calls.append(prompt)
+
+        # Skip __init__, which needs google-generativeai
+        guidance = GeminiGuidance.__new__(GeminiGuidance)
+        guidance.model = types.SimpleNamespace(generate_content_async=generate_content_async)
+        guidance.rate_limiter = limiter
+        guidance.timeout = 0.05
+
+        with self.assertRaises(RateLimitExceeded):
+            await asyncio.wait_for(guidance([{"goal": "Read more", "timeframe": "1 month"}]), 2)
+        self.assertEqual(calls, [])
+        self.assertEqual(limiter.stats()["waiting"], 0)
+
+
+class MicroBatcherCancellationTest(unittest.IsolatedAsyncioTestCase):
+
+    def _batcher(self, delay, max_wait=0.01):
+        self.batches = []
+        self.batch_cancelled = asyncio.Event()
+
+        async def batch_fn(items):
+            self.batches.append(list(items))
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.batch_cancelled.set()
+                raise
+            return [item.upper() for item in items]
+        return MicroBatcher(batch_fn, max_wait=max_wait)
+
+    async def test_item_cancelled_before_flush_is_left_out(self):
+        batcher = self._batcher(delay=0, max_wait=0.05)
+        cancelled = asyncio.create_task(batcher.submit("a"))
+        kept = asyncio.create_task(batcher.submit("b"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        self.assertEqual(await asyncio.wait_for(kept, 1), "B")
+        self.assertEqual(self.batches, [["b"]])
+
+    async def test_batch_runs_while_any_caller_waits(self):
+        batcher = self._batcher(delay=0.05)
+        cancelled = asyncio.create_task(batcher.submit("a"))
+        kept = asyncio.create_task(batcher.submit("b"))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        self.assertEqual(await asyncio.wait_for(kept, 1), "B")
+        self.assertFalse(self.batch_cancelled.is_set())
+
+    async def test_batch_call_stops_when_every_caller_is_cancelled(self):
+        batcher = self._batcher(delay=10)
+        callers = [asyncio.create_task(batcher.submit(item)) for item in ("a", "b")]
+        await asyncio.sleep(0.02)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(self.batch_cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(batcher._tasks, {})
+
+
+class _SlowPortia:
+    async def generate_plan(self, prompt):
+        await asyncio.sleep(10)
+
+
+class GuidanceCancellationTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {
+            "DREAM_TASK_DATA_DIR": data_dir.name,
+            "RESULTS_STORE": "off",
+            "GOAL_ROUTING": "off",
+            "GUIDANCE_BATCHING": "off"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_cancelled_request_cancels_its_guidance(self):
+        import portia_agent
+
+        runtime = portia_agent.AgentRuntime(enable_cloud_logging=False)
+        runtime.config = types.SimpleNamespace(llm_provider="google", default_model="test-model")
+        runtime.portia_for_model = lambda model: _SlowPortia()
+        agent = portia_agent.DreamTaskAgent(runtime=runtime, enable_cloud_logging=False)
+        guidance_cancelled = asyncio.Event()
+
+        async def slow_guidance(goal, timeframe, priority):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                guidance_cancelled.set()
+                raise
+
+        agent._generate_guidance = slow_guidance
+        task = asyncio.create_task(agent._process_with_portia("Read more", "1 month"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.wait_for(guidance_cancelled.wait(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for reusing the plan of a similar, previously planned goal
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_store import ResultsStore
+from similarity_index import NUMPY_AVAILABLE, GoalSimilarityIndex, numeric_tokens
+
+
+class NumericTokensTest(unittest.TestCase):
+
+    def test_durations_are_left_to_the_timeframe(self):
+        self.assertEqual(numeric_tokens("learn to play guitar in 6 months"), ())
+        self.assertEqual(numeric_tokens("Lose 5 kg in 3-months"), ("5",))
+        self.assertEqual(numeric_tokens("Run 3 days a week"), ("3",))
+        self.assertEqual(numeric_tokens("Read 12 books this year"), ("12",))
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy is required for the goal similarity index")
+class SimilarPlanReuseTest(unittest.TestCase):
+
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {"DREAM_TASK_DATA_DIR": data_dir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        import portia_agent
+        self.store = ResultsStore(os.path.join(data_dir.name, "results.db"))
+        self.addCleanup(self.store.close)
+        self.index = GoalSimilarityIndex()
+        self.agent = portia_agent.DreamTaskAgent(
+            runtime=portia_agent.AgentRuntime(enable_cloud_logging=False),
+            enable_cloud_logging=False, results_store=self.store, goal_index=self.index
+        )
+
+    def _planned(self, goal, timeframe):
+        result = {"success": True, "tasks": [], "plan_id": "plan-1"}
+        result_id = self.store.record(result, goal, timeframe, "alice", provider="google", model="test-model")
+        self.index.observe(result_id, goal, result)
+        return result_id
+
+    def test_goal_with_a_duration_reuses_the_plain_goal(self):
+        result_id = self._planned("Learn to play guitar", "6 months")
+        reused = self.agent._reuse_similar_plan("learn to play guitar in 6 months", "6 months", "bob")
+        self.assertIsNotNone(reused)
+        self.assertEqual(reused["reused_from"]["result_id"], result_id)
+        self.assertEqual(reused["user_id"], "bob")
+
+    def test_different_quantities_are_not_reused(self):
+        self._planned("Lose 50 kg", "6 months")
+        self.assertIsNone(self.agent._reuse_similar_plan("Lose 5 kg", "6 months", "bob"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative candidate selection and budget accounting
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import types
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goal_router import GoalRouter
+from pre_planner import SpeculativePlanner
+from rate_limiter import QuotaRateLimiter
+
+
+def _planner(router):
+    agent = types.SimpleNamespace(router=router, results_store=None)
+    planner = SpeculativePlanner(agent, timeframes=("1 month",), min_requests=1.0)
+    for _ in range(3):
+        planner.tracker.observe("Read more", "1 month", "learning")
+    return planner
+
+
+class NextCandidateTest(unittest.TestCase):
+
+    def test_routed_local_goals_are_skipped(self):
+        self.assertIsNone(_planner(GoalRouter(local_below=1.0))._next_candidate())
+
+    def test_shadow_router_does_not_skip(self):
+        planner = _planner(GoalRouter(local_below=1.0, shadow=True))
+        self.assertEqual(planner._next_candidate(), ("Read more", "1 month"))
+
+    def test_no_router(self):
+        self.assertEqual(_planner(None)._next_candidate(), ("Read more", "1 month"))
+
+
+class BudgetRefundTest(unittest.IsolatedAsyncioTestCase):
+
+    async def _plan_once(self, result):
+        agent = types.SimpleNamespace(router=None, results_store=None,
+                                      runtime=types.SimpleNamespace(rate_limiter=QuotaRateLimiter()))
+        planner = SpeculativePlanner(agent, timeframes=("1 month",), min_requests=1.0,
+                                     calls_per_plan=4, idle_seconds=0, poll_interval=0.01)
+        for _ in range(3):
+            planner.tracker.observe("Read more", "1 month", "learning")
+        done = asyncio.Event()
+
+        async def process_goal(*args, **kwargs):
+            done.set()
+            return result
+        agent.process_goal = process_goal
+        planner.start()
+        await asyncio.wait_for(done.wait(), 1)
+        await asyncio.sleep(0.02)
+        await planner.stop()
+        return planner
+
+    async def test_llm_plan_spends_budget(self):
+        planner = await self._plan_once({"success": True})
+        self.assertEqual((planner.planned, planner._calls_last_hour()), (1, 4))
+
+    async def test_failed_llm_call_still_spends_budget(self):
+        planner = await self._plan_once({"success": True, "fallback": True})
+        self.assertEqual((planner.failed, planner._calls_last_hour()), (1, 4))
+
+    async def test_skipped_llm_call_is_refunded(self):
+        planner = await self._plan_once({"success": True, "fallback": True, "llm_skipped": True})
+        self.assertEqual((planner.failed, planner._calls_last_hour()), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
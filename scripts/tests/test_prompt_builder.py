@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact planning prompt and its token budget
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import MIN_GOAL_TOKENS, PromptBuilder, compact_context, estimate_tokens
+
+
+class CompactContextTest(unittest.TestCase):
+
+    def test_drops_user_id_empty_values_and_default_preferences(self):
+        context = compact_context(
+            {"user_id": "alice", "notes": "", "history": [], "skills": ["python"],
+             "preferences": {"difficulty": "hard", "style": None}},
+            defaults={"difficulty": "medium"}
+        )
+        self.assertEqual(context, {"skills": ["python"], "preferences": {"difficulty": "hard"}})
+        self.assertEqual(compact_context({"preferences": {"difficulty": "medium"}}, defaults={"difficulty": "medium"}), {})
+
+
+class PromptBudgetTest(unittest.TestCase):
+
+    def test_within_budget_is_untouched(self):
+        built = PromptBuilder(token_budget=1024).build("Learn to play guitar", "3 months", {"notes": "evenings only"})
+        self.assertEqual(built["dropped_context"], [])
+        self.assertFalse(built["truncated_goal"])
+        self.assertIn('Context: {"notes":"evenings only"}', built["prompt"])
+        self.assertEqual(built["tokens"], estimate_tokens(built["prompt"]))
+
+    def test_context_is_dropped_in_order_before_the_goal(self):
+        context = {"history": "x " * 200, "notes": "y " * 200, "skills": ["python"]}
+        base = estimate_tokens(PromptBuilder()._render("Learn to play guitar", "3 months", {"skills": ["python"]}))
+        builder = PromptBuilder(token_budget=base)
+        built = builder.build("Learn to play guitar", "3 months", context)
+        self.assertEqual(built["dropped_context"], ["history", "notes"])
+        self.assertFalse(built["truncated_goal"])
+        self.assertLessEqual(built["tokens"], base)
+        self.assertEqual(builder.stats()["over_budget"], 1)
+
+    def test_goal_is_shortened_but_never_below_the_minimum(self):
+        goal = " ".join(f"step{i}" for i in range(200))
+        built = PromptBuilder(token_budget=10).build(goal, "1 year", {"notes": "anything"})
+        self.assertEqual(built["dropped_context"], ["notes"])
+        self.assertTrue(built["truncated_goal"])
+        kept = built["prompt"].split("\n")[1][len("Goal: "):]
+        self.assertTrue(goal.startswith(kept))
+        self.assertGreaterEqual(estimate_tokens(kept), MIN_GOAL_TOKENS)
+        self.assertLess(estimate_tokens(kept), MIN_GOAL_TOKENS + 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
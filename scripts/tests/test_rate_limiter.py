@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the quota-aware LLM rate limiter
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import time
+import types
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import (Priority, QuotaRateLimiter, QueueDropped, RateLimitExceeded,
+                          is_rate_limit_error, retry_after_seconds)
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 Resource has been exhausted")
+        self.retry_after = retry_after
+
+
+def _drained(requests_per_minute=600, **kwargs):
+    """Limiter with an empty request bucket (600/min refills one request every 0.1 s)"""
+    limiter = QuotaRateLimiter(requests_per_minute=requests_per_minute, **kwargs)
+    limiter.requests.tokens = 0
+    return limiter
+
+
+class PriorityQueueTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_grants_in_priority_order(self):
+        limiter = _drained()
+        granted = []
+
+        async def acquire(priority):
+            await limiter.acquire(priority=priority)
+            granted.append(priority)
+
+        waiters = [asyncio.create_task(acquire(p))
+                   for p in (Priority.SPECULATIVE, Priority.BATCH, Priority.INTERACTIVE, Priority.BATCH)]
+        await asyncio.wait_for(asyncio.gather(*waiters), 2)
+        self.assertEqual(granted, [Priority.INTERACTIVE, Priority.BATCH, Priority.BATCH, Priority.SPECULATIVE])
+        stats = limiter.stats()
+        self.assertEqual((stats["granted"], stats["queued"], stats["waiting"]), (4, 4, 0))
+        self.assertEqual(stats["queued_by_priority"], {"interactive": 1, "batch": 2, "speculative": 1})
+
+    async def test_waiter_past_deadline_is_dropped(self):
+        limiter = _drained(requests_per_minute=6)
+        started = time.monotonic()
+        with self.assertRaises(QueueDropped):
+            await limiter.acquire(priority=Priority.BATCH, deadline=started + 0.05)
+        self.assertLess(time.monotonic() - started, 1)
+        stats = limiter.stats()
+        self.assertEqual((stats["dropped"], stats["dropped_by_priority"]["batch"], stats["waiting"]), (1, 1, 0))
+
+    async def test_full_queue_drops_new_work(self):
+        limiter = _drained(requests_per_minute=6, max_queue=1)
+        queued = asyncio.create_task(limiter.acquire(priority=Priority.SPECULATIVE))
+        await asyncio.sleep(0)
+        with self.assertRaises(QueueDropped):
+            await limiter.acquire()
+        self.assertEqual(limiter.stats()["dropped_by_priority"]["interactive"], 1)
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+
+
+class RetryAfterTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_429_pauses_for_retry_after_then_retries(self):
+        limiter = QuotaRateLimiter()
+        attempts = []
+
+        async def fn():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise _RateLimited(retry_after=0.1)
+            return "ok"
+
+        self.assertEqual(await asyncio.wait_for(limiter.call(fn), 2), "ok")
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.1)
+        stats = limiter.stats()
+        self.assertEqual((stats["throttled"], stats["retried"], stats["granted"]), (1, 1, 2))
+
+    async def test_pause_holds_other_callers(self):
+        limiter = QuotaRateLimiter()
+        limiter.pause(0.1)
+        self.assertGreater(limiter.stats()["paused_for"], 0)
+        started = time.monotonic()
+        await asyncio.wait_for(limiter.acquire(), 2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    async def test_retry_after_past_deadline_gives_up(self):
+        limiter = QuotaRateLimiter()
+
+        async def fn():
+            raise _RateLimited(retry_after=30)
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            await limiter.call(fn, deadline=time.monotonic() + 1)
+        # The call was made, so this is not a queue drop
+        self.assertNotIsInstance(raised.exception, QueueDropped)
+        self.assertEqual(limiter.stats()["dropped"], 1)
+
+    async def test_other_errors_are_not_retried(self):
+        limiter = QuotaRateLimiter()
+
+        async def fn():
+            raise ValueError("bad plan")
+
+        with self.assertRaises(ValueError):
+            await limiter.call(fn)
+        self.assertEqual(limiter.stats()["retried"], 0)
+
+    def test_rate_limit_errors_and_retry_delays(self):
+        self.assertTrue(is_rate_limit_error(_RateLimited()))
+        self.assertTrue(is_rate_limit_error(Exception("Quota exceeded for metric")))
+        self.assertFalse(is_rate_limit_error(ValueError("bad plan")))
+
+        self.assertEqual(retry_after_seconds(_RateLimited(retry_after=7)), 7.0)
+        response = types.SimpleNamespace(headers={"retry-after": "12"})
+        self.assertEqual(retry_after_seconds(types.SimpleNamespace(response=response)), 12.0)
+        self.assertEqual(retry_after_seconds(Exception("429 ... retry_delay { seconds: 41 }")), 41.0)
+        self.assertEqual(retry_after_seconds(Exception("Please retry in 2.5s")), 2.5)
+        self.assertIsNone(retry_after_seconds(Exception("429")))
+
+
+if __name__ == "__main__":
+    unittest.main()
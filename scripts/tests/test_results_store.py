@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite results store: paging, categories and JSONL round trips
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_store import ResultsStore
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.data_dir.name, "results.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.data_dir.cleanup()
+
+    def _record(self, goal, user_id, created_at):
+        return self.store.record({"success": True, "goal": goal}, goal, "3 months", user_id, created_at=created_at)
+
+    def test_iter_results_pages_in_insertion_order(self):
+        ids = [self._record(f"Goal {i}", "alice", 100.0 - i) for i in range(7)]
+        self.assertEqual([row["id"] for row in self.store.iter_results(batch_size=3)], ids)
+        self.assertEqual([row["id"] for row in self.store.iter_results(batch_size=3, since_id=ids[4])], ids[5:])
+
+    def test_user_pages_do_not_skip_rows_with_equal_timestamps(self):
+        expected = []
+        for i in range(9):
+            # Three rows per timestamp, so ties straddle the page boundaries
+            row_id = self._record(f"Goal {i}", "alice", 1000.0 + i // 3)
+            self._record(f"Other {i}", "bob", 1000.0 + i // 3)
+            expected.append(row_id)
+        rows = list(self.store.iter_results(batch_size=2, user_id="alice"))
+        self.assertEqual([row["id"] for row in rows], expected)
+        self.assertEqual({row["user_id"] for row in rows}, {"alice"})
+        self.assertEqual(list(self.store.iter_results(user_id="nobody")), [])
+
+    def test_user_results_come_in_created_order(self):
+        late = self._record("Late", "alice", 2000.0)
+        early = self._record("Early", "alice", 1000.0)
+        self.assertEqual([row["id"] for row in self.store.iter_results(batch_size=1, user_id="alice")], [early, late])
+
+    def test_imported_rows_get_a_category(self):
+        self.store.import_rows([
+            {"goal": "Lose weight before summer", "timeframe": "3-months", "result": {"success": True}},
+            {"goal": "Learn Spanish", "timeframe": "6 months", "category": "language", "result": {}}
+        ])
+        categories = {row["goal"]: row["category"] for row in self.store.iter_results()}
+        self.assertEqual(categories, {"Lose weight before summer": "health", "Learn Spanish": "language"})
+
+    def test_jsonl_round_trip(self):
+        self._record("Write a novel", "alice", 1000.0)
+        exported = io.StringIO()
+        self.assertEqual(self.store.export_jsonl(exported), 1)
+        other = ResultsStore(os.path.join(self.data_dir.name, "other.db"))
+        self.assertEqual(other.import_jsonl(io.StringIO(exported.getvalue())), 1)
+        row = next(other.iter_results())
+        self.assertEqual((row["goal"], row["timeframe"], row["result"]["goal"]), ("Write a novel", "3 months", "Write a novel"))
+        other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
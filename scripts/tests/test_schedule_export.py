@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for iCalendar and CSV schedule export
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import io
+import os
+import csv
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_export import CSV_COLUMNS, _fold, _ics_text, write_csv, write_ics
+
+
+def _row(description="Practice chords; scales, daily"):
+    return {
+        "id": 7,
+        "user_id": "alice",
+        "goal": "Learn guitar",
+        "result": {
+            "timeline": {
+                "weekly_schedule": [{"week": 1, "start_date": "2025-01-06T09:00:00",
+                                     "focus_area": "learning", "tasks": [description]}],
+                "milestones": [{"title": "First song", "date": "2025-01-31", "description": "Play it through"}]
+            }
+        }
+    }
+
+
+class IcsTextTest(unittest.TestCase):
+
+    def test_escapes_special_characters(self):
+        self.assertEqual(_ics_text("a\\b;c,d\r\ne\nf"), "a\\\\b\\;c\\,d\\ne\\nf")
+
+    def test_short_lines_are_not_folded(self):
+        self.assertEqual(_fold("SUMMARY:" + "x" * 67), "SUMMARY:" + "x" * 67 + "\r\n")
+
+    def test_folds_at_75_octets(self):
+        line = "DESCRIPTION:" + "x" * 200
+        folded = _fold(line)
+        physical = folded[:-2].split("\r\n")
+        self.assertTrue(all(len(p.encode("utf-8")) <= 75 for p in physical))
+        self.assertTrue(all(p.startswith(" ") for p in physical[1:]))
+        self.assertEqual("".join(p[1:] if i else p for i, p in enumerate(physical)), line)
+
+    def test_never_splits_a_multibyte_character(self):
+        line = "SUMMARY:" + "é" * 30 + "日本語" * 20
+        physical = _fold(line)[:-2].split("\r\n")
+        self.assertTrue(all(len(p.encode("utf-8")) <= 75 for p in physical))
+        self.assertEqual("".join(p[1:] if i else p for i, p in enumerate(physical)), line)
+
+
+class ExportTest(unittest.TestCase):
+
+    def test_ics_events(self):
+        out = io.StringIO()
+        self.assertEqual(write_ics([_row()], out), 2)
+        text = out.getvalue()
+        self.assertTrue(text.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(text.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(text.count("BEGIN:VEVENT"), 2)
+        self.assertIn("UID:7-week-1@dream-task\r\n", text)
+        self.assertIn("DTSTART;VALUE=DATE:20250106\r\nDTEND;VALUE=DATE:20250113\r\n", text)
+        self.assertIn("DESCRIPTION:Practice chords\\; scales\\, daily\r\n", text)
+        self.assertIn("SUMMARY:Learn guitar: First song\r\n", text)
+
+    def test_long_description_is_folded(self):
+        out = io.StringIO()
+        write_ics([_row(description="Practice " * 40)], out)
+        self.assertTrue(all(len(line.encode("utf-8")) <= 75 for line in out.getvalue().split("\r\n")))
+
+    def test_csv_rows(self):
+        out = io.StringIO()
+        self.assertEqual(write_csv([_row()], out), 2)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        self.assertEqual(rows[1], ["alice", "Learn guitar", "week", "Learn guitar: Week 1 (learning)",
+                                   "2025-01-06", "2025-01-13", "Practice chords; scales, daily", "7"])
+        self.assertEqual(rows[2][2:6], ["milestone", "Learn guitar: First song", "2025-01-31", "2025-02-01"])
+
+
+if __name__ == "__main__":
+    unittest.main()
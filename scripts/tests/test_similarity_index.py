@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the goal similarity index: LSH recall, incremental merges and snapshots
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity_index import NUMPY_AVAILABLE, GoalSimilarityIndex
+
+VERBS = ["learn", "start", "build", "write", "run", "master", "launch", "improve", "practice", "design"]
+TOPICS = ["guitar", "piano", "spanish", "python", "marathon", "novel", "podcast", "garden", "bakery",
+          "photography", "chess", "investing", "yoga", "painting", "japanese", "robotics", "pottery"]
+EXTRAS = ["at home", "with friends", "for beginners", "on weekends", "every morning", "online",
+          "from scratch", "as a hobby", "for my family", "with a coach"]
+
+
+def _goals(count, seed=3):
+    rng = random.Random(seed)
+    return [f"{rng.choice(VERBS)} {rng.choice(TOPICS)} {rng.choice(EXTRAS)} {rng.choice(TOPICS)}"
+            for _ in range(count)]
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy is required for the goal similarity index")
+class GoalSimilarityIndexTest(unittest.TestCase):
+
+    def _index(self, goals, **kwargs):
+        index = GoalSimilarityIndex(**kwargs)
+        items = list(enumerate(goals, 1))
+        for start in range(0, len(items), 100):
+            index.add_many(items[start:start + 100])
+        return index
+
+    def test_recall_against_exact_search(self):
+        goals = _goals(3000)
+        index = self._index(goals, merge_threshold=700)
+        # Probes cover both the sorted tables and the unsorted tail
+        self.assertEqual(index._indexed, 2800)
+        vectors = [index.vectorizer.transform(goal) for goal in goals]
+        found = total = 0
+        for i in range(0, 3000, 30):
+            query = goals[i] + " soon"
+            vector = index.vectorizer.transform(query)
+            exact = {j + 1 for j, v in enumerate(vectors) if float(v @ vector) >= 0.8}
+            approx = {result_id for result_id, _score in index.query(query, k=len(exact) + 1, min_similarity=0.8)}
+            found += len(exact & approx)
+            total += len(exact)
+        self.assertGreater(total, 100)
+        self.assertGreaterEqual(found / total, 0.9)
+
+    def test_incremental_merge_matches_full_sort(self):
+        goals = _goals(2000)
+        incremental = self._index(goals[:1000], merge_threshold=100)
+        incremental.add_many(list(enumerate(goals[1000:], 1001)))
+        incremental._merge()
+        full = GoalSimilarityIndex(merge_threshold=10 ** 9)
+        full.add_many(list(enumerate(goals, 1)))
+        full._merge()
+        self.assertTrue((incremental._sorted_keys == full._sorted_keys).all())
+        self.assertTrue((incremental._sorted_rows == full._sorted_rows).all())
+
+    def test_snapshot_keeps_the_sorted_tables(self):
+        goals = _goals(500)
+        index = self._index(goals, merge_threshold=64)
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, "goal_index.npz")
+            index.save(path)
+            loaded = GoalSimilarityIndex.load(path)
+        self.assertEqual(loaded._indexed, 500)
+        self.assertEqual(loaded.last_result_id, 500)
+        self.assertTrue((loaded._sorted_rows == index._sorted_rows).all())
+        self.assertEqual(loaded.query(goals[7], k=1)[0][0], index.query(goals[7], k=1)[0][0])
+        # Inserts after loading grow the loaded arrays
+        loaded.add(501, "juggle flaming torches")
+        self.assertEqual(loaded.query("juggle flaming torches", k=1)[0][0], 501)
+
+
+if __name__ == "__main__":
+    unittest.main()
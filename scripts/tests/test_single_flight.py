@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Regression tests for single-flight coalescing when the leading request is cancelled
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import types
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from single_flight import FCNTL_AVAILABLE, SingleFlight
+from rate_limiter import Priority
+
+
+class SingleFlightCancellationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_follower_takes_over_when_leader_is_cancelled(self):
+        flight = SingleFlight(lock_dir=None)
+        started = asyncio.Event()
+        calls = []
+
+        async def slow(name):
+            calls.append(name)
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            calls.append("follower")
+            return "follower result"
+
+        leader = asyncio.create_task(flight.do("key", lambda: slow("leader")))
+        await started.wait()
+        follower = asyncio.create_task(flight.do("key", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        result, shared = await asyncio.wait_for(follower, 1)
+        self.assertEqual(result, "follower result")
+        self.assertFalse(shared)
+        self.assertEqual(calls, ["leader", "follower"])
+
+    async def test_urgent_call_overtakes_a_less_urgent_leader(self):
+        flight = SingleFlight(lock_dir=None)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "speculative"
+
+        async def fast():
+            return "interactive"
+
+        leader = asyncio.create_task(flight.do("key", slow, priority=2))
+        await asyncio.sleep(0)
+        self.assertEqual(await asyncio.wait_for(flight.do("key", fast, priority=0), 1), ("interactive", False))
+        # Equally or less urgent calls still follow
+        follower = asyncio.create_task(flight.do("key", fast, priority=2))
+        release.set()
+        self.assertEqual(await leader, ("speculative", False))
+        self.assertEqual(await follower, ("speculative", True))
+        self.assertEqual(flight.stats()["overtaken"], 1)
+
+    @unittest.skipUnless(FCNTL_AVAILABLE, "cross-process coalescing needs fcntl")
+    async def test_wait_on_another_process_is_capped_by_max_wait(self):
+        import fcntl
+
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flight = SingleFlight(lock_dir=lock_dir, wait_timeout=120)
+            # Another process's leader holding the key's lock
+            fd = os.open(os.path.join(lock_dir, "key.lock"), os.O_RDWR | os.O_CREAT)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+            async def work():
+                return "ran here"
+
+            try:
+                result = await asyncio.wait_for(flight.do("key", work, max_wait=0.2), 2)
+            finally:
+                os.close(fd)
+        self.assertEqual(result, ("ran here", False))
+
+    async def test_followers_share_a_finished_leader(self):
+        flight = SingleFlight(lock_dir=None)
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return {"plan": 1}
+
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+        self.assertEqual([shared for _result, shared in results].count(False), 1)
+        self.assertEqual(flight.stats()["local_followers"], 4)
+
+
+class _FakePortia:
+    """The first plan takes `first_delay` seconds, later ones are immediate"""
+
+    def __init__(self, first_delay):
+        self.delays = [first_delay]
+
+    async def generate_plan(self, prompt):
+        await asyncio.sleep(self.delays.pop() if self.delays else 0)
+        return types.SimpleNamespace(id="plan", model_dump_json=lambda: "{}")
+
+    async def run_plan(self, plan, end_user=None):
+        return types.SimpleNamespace(id="run", model_dump_json=lambda: "{}")
+
+
+class AgentCoalescingTest(unittest.IsolatedAsyncioTestCase):
+    """Coalescing in process_goal when the leading request is cancelled or less urgent"""
+
+    GOAL, TIMEFRAME = "Start a candle business", "3 months"
+
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {
+            "DREAM_TASK_DATA_DIR": data_dir.name,
+            "RESULTS_STORE": "off",
+            "GOAL_ROUTING": "off",
+            "GUIDANCE_BATCHING": "off"
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _agent(self, first_delay):
+        import portia_agent
+
+        runtime = portia_agent.AgentRuntime(enable_cloud_logging=False)
+        runtime.portia = _FakePortia(first_delay)
+        runtime.config = types.SimpleNamespace(llm_provider="google", default_model="test-model")
+        runtime.portia_for_model = lambda model: runtime.portia
+        available = portia_agent.PORTIA_AVAILABLE
+        portia_agent.PORTIA_AVAILABLE = True
+        self.addCleanup(setattr, portia_agent, "PORTIA_AVAILABLE", available)
+        return portia_agent.DreamTaskAgent(runtime=runtime, enable_cloud_logging=False)
+
+    async def test_follower_survives_leader_cancel(self):
+        agent = self._agent(first_delay=0.2)
+        leader = asyncio.create_task(agent.process_goal(self.GOAL, self.TIMEFRAME, user_id="bob", priority=Priority.BATCH))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(agent.process_goal(self.GOAL, self.TIMEFRAME, user_id="alice", priority=Priority.BATCH))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+        result = await asyncio.wait_for(follower, 2)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["user_id"], "alice")
+        await agent.shutdown()
+
+    async def test_interactive_request_does_not_wait_on_speculative_run(self):
+        from pre_planner import SpeculativePlanner
+
+        agent = self._agent(first_delay=10)
+        planner = SpeculativePlanner(agent)
+        agent.pre_planner = planner
+        speculative = asyncio.create_task(agent.process_goal(
+            self.GOAL, self.TIMEFRAME, user_id="speculative-planner", priority=Priority.SPECULATIVE
+        ))
+        planner._current = speculative
+        await asyncio.sleep(0.05)
+
+        result = await asyncio.wait_for(agent.process_goal(self.GOAL, self.TIMEFRAME, user_id="alice"), 2)
+        self.assertTrue(result["success"])
+        self.assertFalse(result.get("coalesced"))
+        # The interactive request preempted the speculative run for its own goal
+        with self.assertRaises(asyncio.CancelledError):
+            await speculative
+        self.assertEqual(agent.single_flight.stats()["overtaken"], 1)
+        await agent.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
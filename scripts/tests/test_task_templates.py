@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the task template registry against the original inline task lists
+
+Run: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import goal_tools
+from task_templates import FrozenTask, get_registry
+from bench_task_templates import legacy_generate_task_breakdown
+
+GOALS = [
+    "Learn to play guitar", "Start a podcast", "rebuild my garden", "smart investing",
+    "Launch a startup", "Get fit and lose weight", "Write a novel", "Travel around Japan",
+    "Build a workout app", "Create content daily", "Master chess in a year", "Run a marathon",
+    "Party planning for my sister", "Heart health check"
+]
+
+
+def _canonical(tasks):
+    return json.dumps(tasks, sort_keys=True)
+
+
+class TaskBreakdownTest(unittest.TestCase):
+
+    def test_output_matches_the_original_implementation(self):
+        for goal in GOALS:
+            for timeframe in ("2 weeks", "3 months", "1 year"):
+                complexity = goal_tools.analyze_goal_complexity(goal, timeframe)
+                with self.subTest(goal=goal, timeframe=timeframe):
+                    self.assertEqual(
+                        _canonical(goal_tools.generate_task_breakdown(goal, timeframe, complexity)),
+                        _canonical(legacy_generate_task_breakdown(goal, timeframe, complexity))
+                    )
+
+    def test_categories_and_templates_use_the_same_keyword_rule(self):
+        shared = set(get_registry().categories())
+        for goal in GOALS:
+            category = goal_tools.categorize_goal(goal)
+            if category in shared:
+                with self.subTest(goal=goal):
+                    self.assertIn(category, get_registry().match(goal, match_all=True))
+
+    def test_fallback_keywords_only_apply_to_the_fallback(self):
+        registry = get_registry()
+        self.assertEqual(registry.match("Finish my school project", match_all=True), [])
+        self.assertEqual(registry.match("Finish my school project", match_all=True, fallback=True), ["business"])
+
+    def test_fixed_tasks_are_shared_and_read_only(self):
+        first = goal_tools.generate_task_breakdown("Write a novel", "3 months", {"estimated_duration_weeks": 12})
+        second = goal_tools.generate_task_breakdown("Write a novel", "3 months", {"estimated_duration_weeks": 12})
+        shared = [task for task in first if isinstance(task, FrozenTask)]
+        self.assertTrue(shared)
+        self.assertIs(shared[0], next(task for task in second if isinstance(task, FrozenTask)))
+        with self.assertRaises(TypeError):
+            shared[0]["title"] = "changed"
+
+
+if __name__ == "__main__":
+    unittest.main()